@@ -0,0 +1,69 @@
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any
+
+from django.core.cache import caches
+from django.db.models import Model
+
+from django_oapif.versioning import get_version
+
+CACHE_PREFIX = "django_oapif.response"
+
+
+class ResponseCache:
+    """Caches rendered item pages, gzip-compressed, in a Django cache backend.
+
+    Entries are keyed on the collection, the normalized query parameters, the user and the version of the model
+    (see `django_oapif.versioning`), so writes make them unreachable instead of having to find and delete them.
+    Unreachable entries are evicted by the backend, eg: `MAX_ENTRIES` culling or Redis' `maxmemory` policy.
+    Entries larger than `max_entry_size` bytes once compressed are not cached.
+
+    Examples:
+        >>> class CachedCollection(AnonReadOnlyCollection):
+        ...     response_cache = ResponseCache(timeout=60)
+    """
+
+    def __init__(
+        self,
+        alias: str = "default",
+        *,
+        timeout: float | None = 300,
+        max_entry_size: int = 1024 * 1024,
+        compresslevel: int = 6,
+    ) -> None:
+        self.alias = alias
+        self.timeout = timeout
+        self.max_entry_size = max_entry_size
+        self.compresslevel = compresslevel
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_key(self, collection_id: str, model: type[Model], params: dict[str, Any], user_pk: Any = None) -> str:
+        version = get_version(model)
+        normalized = json.dumps([params, user_pk], sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(normalized.encode()).hexdigest()
+        return f"{CACHE_PREFIX}:{collection_id}:{version.token}:{digest}"
+
+    def get(self, key: str) -> bytes | None:
+        """Return the gzip-compressed content cached under `key`, counting hits and misses."""
+        compressed = caches[self.alias].get(key)
+        with self._lock:
+            if compressed is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return compressed
+
+    def set(self, key: str, content: bytes) -> bytes:
+        """Cache `content` under `key`, and return it gzip-compressed so it can be sent as-is."""
+        compressed = gzip.compress(content, compresslevel=self.compresslevel, mtime=0)
+        if len(compressed) <= self.max_entry_size:
+            caches[self.alias].set(key, compressed, self.timeout)
+        return compressed
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
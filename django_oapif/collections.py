@@ -1,20 +1,32 @@
+import gzip
+import json
 from typing import Any
+from urllib.parse import urlencode
 
-from django.contrib.gis.db.models import Extent
 from django.contrib.gis.geos import GEOSGeometry
 from django.db.models import Model
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.vary import vary_on_headers
 from ninja import Header, Query, Router
+from ninja.decorators import decorate_view
 from ninja.errors import AuthorizationError, HttpError, ValidationError
 
+from django_oapif.compression import negotiate_encoding, set_content_encoding
+from django_oapif.cql2 import FilterLang
 from django_oapif.crs import CRS, CRS84_SRID, CRS84_URI, BBox
+from django_oapif.encoders import Encoder, Items, get_collection_encoders, negotiate_encoder
+from django_oapif.export import EXPORT_CONTENT_TYPES, EXPORT_FILE_EXTENSIONS, ExportFormat, is_export_available
 from django_oapif.geojson import (
     GenericFeature,
     GenericFeatureCollection,
     GenericFeaturePatch,
 )
-from django_oapif.handler import OapifCollection
+from django_oapif.handler import OapifCollection, RenderedPage
+from django_oapif.pagination import decode_cursor, encode_cursor, keyset_filter
 from django_oapif.schema import (
     OAPIFCollection,
     OAPIFCollections,
@@ -22,16 +34,34 @@ from django_oapif.schema import (
     OAPIFLink,
     OAPIFSpatialExtent,
 )
-from django_oapif.utils import replace_query_param
+from django_oapif.tiles import is_valid_tile
+from django_oapif.utils import parse_byte_range, replace_query_param
 
+MVT_CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+# Default values of the `/items` parameters, left out of normalized URLs
+NORMALIZED_DEFAULTS: dict[str, Any] = {
+    "offset": 0,
+    "crs": CRS("OGC", CRS84_SRID),
+    "bbox-crs": CRS("OGC", CRS84_SRID),
+    "filter-lang": "cql2-text",
+    "filter-crs": CRS("OGC", CRS84_SRID),
+}
 
-def get_page_links(request: HttpRequest, limit: int, offset: int, total_count: int) -> list[OAPIFLink]:
+
+def get_page_links(
+    url: str,
+    limit: int,
+    offset: int,
+    has_more: bool,
+    next_cursor: str | None = None,
+    media_type: str = "application/geo+json",
+) -> list[OAPIFLink]:
     links = [
         OAPIFLink(
             rel="self",
             title="items (self)",
-            type="application/geo+json",
-            href=request.build_absolute_uri(),
+            type=media_type,
+            href=url,
         )
     ]
     if offset > 0:
@@ -39,22 +69,123 @@ def get_page_links(request: HttpRequest, limit: int, offset: int, total_count: i
             OAPIFLink(
                 rel="prev",
                 title="items (prev)",
-                type="application/geo+json",
-                href=replace_query_param(request, offset=None if offset - limit <= 0 else offset - limit),
+                type=media_type,
+                href=replace_query_param(url, offset=None if offset - limit <= 0 else offset - limit, cursor=None),
             )
         )
-    if offset + limit < total_count:
+    if has_more:
         links.append(
             OAPIFLink(
                 rel="next",
                 title="items (next)",
-                type="application/geo+json",
-                href=replace_query_param(request, offset=offset + limit),
+                type=media_type,
+                href=(
+                    replace_query_param(url, cursor=next_cursor, offset=None)
+                    if next_cursor
+                    else replace_query_param(url, offset=offset + limit)
+                ),
             )
         )
     return links
 
 
+def get_normalized_url(request: HttpRequest, params: dict[str, Any]) -> str:
+    """Return the absolute URL of `request` with its query string rebuilt from the parsed `params`.
+
+    Parameters that are unset or have their default value are left out, so equivalent requests get the same URL.
+    """
+    query = {}
+    for name, value in params.items():
+        if value is None or value is False or value == NORMALIZED_DEFAULTS.get(name):
+            continue
+        if isinstance(value, CRS):
+            value = value.uri
+        elif isinstance(value, BBox):
+            value = f"{value.xmin},{value.ymin},{value.xmax},{value.ymax}"
+        elif isinstance(value, tuple):
+            value = ",".join(value)
+        elif value is True:
+            value = "true"
+        query[name] = value
+    return request.build_absolute_uri(request.path) + (f"?{urlencode(query)}" if query else "")
+
+
+def get_not_modified_response(request: HttpRequest, validators: tuple[str, int] | None) -> HttpResponse | None:
+    """Return the response to a conditional request whose preconditions don't pass, eg: `304 Not Modified`."""
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return response and set_validators(response, validators)
+
+
+def set_validators[R: HttpResponseBase](response: R, validators: tuple[str, int] | None) -> R:
+    if validators is not None:
+        etag, last_modified = validators
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def get_cached_response(
+    request: HttpRequest,
+    collection: OapifCollection,
+    compressed: bytes,
+    content_type: str,
+    validators: tuple[str, int] | None,
+) -> HttpResponse:
+    """Return a response for content stored gzip-compressed by a `ResponseCache`."""
+    # Cached content is sent as-is when the client accepts gzip, never compressed twice
+    if collection.compress_responses and negotiate_encoding(request, ("gzip",)):
+        response = HttpResponse(compressed, content_type=content_type)
+        return set_content_encoding(set_validators(response, validators), "gzip")
+    response = HttpResponse(gzip.decompress(compressed), content_type=content_type)
+    return collection.compress(request, set_validators(response, validators))
+
+
+def get_range_response(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+    """Answer a `Range` request for a single byte range of a buffered, uncompressed `response`.
+
+    Ranges are ignored when the `If-Range` validator doesn't match the response.
+    """
+    response.headers["Accept-Ranges"] = "bytes"
+    header = request.headers.get("Range")
+    if header is None or response.status_code != 200:
+        return response
+    if_range = request.headers.get("If-Range")
+    if if_range is not None and if_range not in (response.headers.get("ETag"), response.headers.get("Last-Modified")):
+        return response
+    length = len(response.content)
+    if (byte_range := parse_byte_range(header, length)) is None:
+        return response
+    start, end = byte_range
+    if start >= length:
+        unsatisfiable = HttpResponse(status=416)
+        unsatisfiable.headers["Content-Range"] = f"bytes */{length}"
+        return unsatisfiable
+    response.content = response.content[start : end + 1]
+    response.status_code = 206
+    response.headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    return response
+
+
+def get_encoded_response(
+    request: HttpRequest,
+    collection: OapifCollection,
+    encoder: Encoder,
+    compressed: bytes,
+    validators: tuple[str, int] | None,
+) -> HttpResponse:
+    """Return a response for items encoded by `encoder` and stored gzip-compressed by a `ResponseCache`."""
+    if encoder.ranges:
+        response = HttpResponse(gzip.decompress(compressed), content_type=encoder.media_type)
+        return get_range_response(request, set_validators(response, validators))
+    if not encoder.compressible:
+        response = HttpResponse(gzip.decompress(compressed), content_type=encoder.media_type)
+        return set_validators(response, validators)
+    return get_cached_response(request, collection, compressed, encoder.media_type, validators)
+
+
 def get_related_object_or_raise(field: str, value: Any, related_model: type[Model]):
     try:
         return related_model.objects.get(pk=value)
@@ -88,6 +219,12 @@ def get_collection_response(request: HttpRequest, collection: OapifCollection):
                 type="application/json",
                 href=request.build_absolute_uri(f"{uri_prefix}{collection.id}/schema"),
             ),
+            OAPIFLink(
+                rel="http://www.opengis.net/def/rel/ogc/1.0/queryables",
+                title="Collection queryables",
+                type="application/schema+json",
+                href=request.build_absolute_uri(f"{uri_prefix}{collection.id}/queryables"),
+            ),
             OAPIFLink(
                 rel="items",
                 title="Collection items",
@@ -97,7 +234,7 @@ def get_collection_response(request: HttpRequest, collection: OapifCollection):
         ],
     )
 
-    if geom := collection.geometry_field:
+    if collection.geometry_field:
         if collection.srid == CRS84_SRID:
             response.storageCrs = CRS84_URI
             response.crs = [CRS84_URI]
@@ -105,7 +242,7 @@ def get_collection_response(request: HttpRequest, collection: OapifCollection):
             crs_uri = f"http://www.opengis.net/def/crs/EPSG/0/{collection.srid}"
             response.storageCrs = crs_uri
             response.crs = [CRS84_URI, crs_uri]
-        if extent := collection.model.objects.aggregate(extent=Extent(geom))["extent"]:
+        if extent := collection.get_extent(request):
             response.extent = OAPIFExtent(spatial=OAPIFSpatialExtent(bbox=[extent], crs=response.storageCrs))
 
     return response
@@ -159,31 +296,202 @@ def create_collections_router(collections: dict[str, OapifCollection]):
         schema["$id"] = request.build_absolute_uri()
         return schema
 
+    @router.get(
+        "/{collection_id}/queryables",
+        operation_id="get_collection_queryables",
+    )
+    def get_queryables(request: HttpRequest, collection_id: str):
+        collection = get_collection_by_id(collection_id, request)
+        # The schema is cached, and shared by all requests
+        queryables = {**collection.get_queryables(request), "$id": request.build_absolute_uri()}
+        return HttpResponse(json.dumps(queryables), content_type="application/schema+json")
+
     @router.get(
         "/{collection_id}/items",
         operation_id="get_collection_items",
         response=GenericFeatureCollection,
     )
+    @decorate_view(vary_on_headers("Accept"))
     def get_items(
         request: HttpRequest,
         collection_id: str,
+        f: str | None = Query(None, description="Output format, instead of the `Accept` header"),
         limit: int = 100,
         offset: int = 0,
         crs: CRS = CRS("OGC", CRS84_SRID),
         bbox_crs: CRS = Query(CRS("OGC", CRS84_SRID), alias="bbox-crs"),
         bbox: BBox | None = Query(None, alias="bbox", description="BBOX in the format: minx,miny,maxx,maxy"),
+        cursor: str | None = Query(None, description="Opaque token from a `next` link, replacing `offset`"),
+        precision: int | None = Query(None, ge=0, le=15, description="Number of decimal digits of coordinates"),
+        simplify: float | None = Query(None, gt=0, description="Geometry simplification tolerance, in CRS units"),
+        scale_denominator: float | None = Query(
+            None, gt=0, alias="scale-denominator", description="Simplify geometries for display at this scale"
+        ),
+        properties: str | None = Query(None, description="Comma-separated names of the properties to return"),
+        skip_geometry: bool = Query(False, alias="skipGeometry", description="Return features without geometries"),
+        filter: str | None = Query(None, description="CQL2 filter expression"),
+        filter_lang: FilterLang = Query("cql2-text", alias="filter-lang"),
+        filter_crs: CRS = Query(CRS("OGC", CRS84_SRID), alias="filter-crs"),
     ):
         collection = get_collection_by_id(collection_id, request)
+        encoder = negotiate_encoder(request, f, get_collection_encoders(collection))
+        paging = [name for name in ("limit", "offset", "cursor") if name in request.GET]
+        if paging and not encoder.paginated:
+            # Rather than silently returning every item
+            raise HttpError(400, f"Output format {encoder.name!r} is not paginated, remove: {', '.join(paging)}")
+        selected_properties = None
+        if properties is not None:
+            selected_properties = tuple(dict.fromkeys(name for name in properties.split(",") if name))
+            output_fields = collection.get_output_fields(request)
+            if unknown := [name for name in selected_properties if name not in output_fields]:
+                raise HttpError(400, f"Unknown properties: {', '.join(unknown)}")
+        if skip_geometry and encoder.requires_geometry:
+            raise HttpError(400, f"Output format {encoder.name!r} requires geometries")
+        validators = collection.get_validators(request)
+        if not_modified := get_not_modified_response(request, validators):
+            return not_modified
 
-        query = collection.query(request, crs, bbox, bbox_crs)
-        paginated_query = query[offset : offset + limit]
+        def respond(content: bytes) -> HttpResponseBase:
+            if response_cache is not None and cache_key is not None:
+                compressed = response_cache.set(cache_key, content)
+                return get_encoded_response(request, collection, encoder, compressed, validators)
+            response = set_validators(HttpResponse(content, content_type=encoder.media_type), validators)
+            return collection.compress(request, response) if encoder.compressible else response
 
-        total_count = query.count()
+        response_cache = collection.response_cache if encoder.cacheable else None
+        cache_key = None
+        url = request.build_absolute_uri()
+        if response_cache is not None:
+            params: dict[str, Any] = {
+                "f": encoder.name,
+                "crs": crs,
+                "bbox": bbox,
+                "bbox-crs": bbox_crs,
+                "properties": selected_properties,
+                "skipGeometry": skip_geometry,
+                "filter": filter,
+                "filter-lang": filter_lang,
+                "filter-crs": filter_crs,
+            }
+            if encoder.paginated:
+                params |= {
+                    "limit": limit,
+                    "offset": offset,
+                    "cursor": cursor,
+                    "precision": precision,
+                    "simplify": simplify,
+                    "scale-denominator": scale_denominator,
+                }
+                # The cached links are shared by all requests with this key, so they are built from its parameters
+                # rather than from the URL of the first request. They are absolute URLs, so the host is part of the key
+                url = get_normalized_url(request, params)
+                params["host"] = request.build_absolute_uri("/")
+            user = getattr(request, "user", None)
+            cache_key = response_cache.get_key(collection.id, collection.model, params, getattr(user, "pk", None))
+            if (cached := response_cache.get(cache_key)) is not None:
+                return get_encoded_response(request, collection, encoder, cached, validators)
 
-        feature_collection = collection.queryset_to_featurecollection(request, paginated_query)
-        feature_collection.numberMatched = total_count
-        feature_collection.links = get_page_links(request, limit, offset, total_count)
-        return feature_collection
+        # Compiled after the cache lookup, so only filters hitting the database count against `unindexed_filters`
+        filter_q = None if filter is None else collection.get_filter(request, filter, filter_lang, filter_crs)
+        count_over = encoder.paginated and collection.count_strategy == "window"
+        tolerance = collection.get_simplify_tolerance(request, crs, simplify, scale_denominator)
+        query = collection.query(
+            request,
+            crs,
+            bbox,
+            bbox_crs,
+            precision=precision,
+            simplify=tolerance,
+            count_over=count_over,
+            properties=selected_properties,
+            skip_geometry=skip_geometry,
+            filter=filter_q,
+        )
+        keyset: tuple[str, ...] = ()
+        if encoder.paginated and collection.pagination == "keyset":
+            keyset = collection.get_keyset(request)
+            query = query.order_by(*keyset)
+        if keyset and cursor:
+            key, offset = decode_cursor(cursor, collection.model, keyset)
+            remaining_query = query.filter(keyset_filter(collection.model, keyset, key))
+        else:
+            remaining_query = query[offset:]
+
+        def get_trailer(page: RenderedPage) -> dict[str, Any]:
+            next_cursor = None
+            if keyset and page.has_more and page.last_key is not None:
+                next_cursor = encode_cursor(page.last_key, offset + page.number_returned)
+            links = get_page_links(url, limit, offset, page.has_more, next_cursor, encoder.media_type)
+            if page.number_matched is None:
+                number_matched = collection.get_number_matched(request, query)
+            else:
+                # After a cursor, the window only counts the rows from the start of the page
+                number_matched = page.number_matched + (offset if keyset and cursor else 0)
+            return {
+                **({} if number_matched is None else {"numberMatched": number_matched}),
+                "links": [link.model_dump() for link in links],
+            }
+
+        # One more row than the page size tells whether there is a next page, without counting
+        items = Items(query, remaining_query[: limit + 1], limit, keyset, get_trailer, crs, selected_properties)
+        chunks = encoder.encode(request, collection, items)
+        # Cached responses are buffered
+        if encoder.is_streamed(collection) and response_cache is None:
+            response = set_validators(StreamingHttpResponse(chunks, content_type=encoder.media_type), validators)
+            return collection.compress(request, response) if encoder.compressible else response
+        return respond(b"".join(chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks))
+
+    @router.get(
+        "/{collection_id}/tiles/{z}/{x}/{y}",
+        operation_id="get_collection_tile",
+    )
+    def get_tile(request: HttpRequest, collection_id: str, z: int, x: int, y: int):
+        collection = get_collection_by_id(collection_id, request)
+        if not collection.geometry_field or not is_valid_tile(z, x, y):
+            raise HttpError(404, "Tile not found")
+
+        def set_cache_control[R: HttpResponseBase](response: R) -> R:
+            user = getattr(request, "user", None)
+            visibility = "private" if user and user.is_authenticated else "public"
+            patch_cache_control(response, **{visibility: True}, max_age=collection.tile_max_age)
+            return response
+
+        validators = collection.get_validators(request)
+        if not_modified := get_not_modified_response(request, validators):
+            return set_cache_control(not_modified)
+
+        response_cache = collection.response_cache
+        if response_cache is None:
+            response = HttpResponse(collection.render_tile(request, z, x, y), content_type=MVT_CONTENT_TYPE)
+            return set_cache_control(collection.compress(request, set_validators(response, validators)))
+        user = getattr(request, "user", None)
+        cache_key = response_cache.get_key(
+            collection.id, collection.model, {"tile": [z, x, y]}, getattr(user, "pk", None)
+        )
+        if (compressed := response_cache.get(cache_key)) is None:
+            compressed = response_cache.set(cache_key, collection.render_tile(request, z, x, y))
+        return set_cache_control(get_cached_response(request, collection, compressed, MVT_CONTENT_TYPE, validators))
+
+    @router.get(
+        "/{collection_id}/export",
+        operation_id="export_collection",
+    )
+    def export_collection(
+        request: HttpRequest,
+        collection_id: str,
+        f: ExportFormat = Query("parquet", description="`parquet` for GeoParquet or `arrow` for an Arrow IPC stream"),
+        crs: CRS = CRS("OGC", CRS84_SRID),
+        bbox_crs: CRS = Query(CRS("OGC", CRS84_SRID), alias="bbox-crs"),
+        bbox: BBox | None = Query(None, alias="bbox", description="BBOX in the format: minx,miny,maxx,maxy"),
+    ):
+        collection = get_collection_by_id(collection_id, request)
+        if not is_export_available():
+            raise HttpError(501, "Columnar exports require the `export` extra")
+        chunks = collection.export(request, collection.query(request, crs, bbox, bbox_crs), crs, f)
+        response = StreamingHttpResponse(chunks, content_type=EXPORT_CONTENT_TYPES[f])
+        response.headers["Content-Disposition"] = f'attachment; filename="{collection.id}.{EXPORT_FILE_EXTENSIONS[f]}"'
+        # Parquet files are compressed column by column
+        return response if f == "parquet" else collection.compress(request, response)
 
     @router.api_operation(
         ["OPTIONS"],
@@ -212,13 +520,23 @@ def create_collections_router(collections: dict[str, OapifCollection]):
         collection_id: str,
         item_id: str,
         crs: CRS = CRS("OGC", CRS84_SRID),
+        precision: int | None = Query(None, ge=0, le=15, description="Number of decimal digits of coordinates"),
+        simplify: float | None = Query(None, gt=0, description="Geometry simplification tolerance, in CRS units"),
+        scale_denominator: float | None = Query(
+            None, gt=0, alias="scale-denominator", description="Simplify geometries for display at this scale"
+        ),
     ):
         collection = get_collection_by_id(collection_id, request)
-        query = collection.query(request, crs)
+        validators = collection.get_validators(request)
+        if not_modified := get_not_modified_response(request, validators):
+            return not_modified
+        tolerance = collection.get_simplify_tolerance(request, crs, simplify, scale_denominator)
+        query = collection.query(request, crs, precision=precision, simplify=tolerance)
         item = get_object_or_404(query, pk=item_id)
         if not collection.has_view_permission(request, item):
             raise AuthorizationError()
-        return collection.model_to_feature(request, item)
+        response = HttpResponse(collection.model_to_feature_json(request, item), content_type="application/geo+json")
+        return collection.compress(request, set_validators(response, validators))
 
     @router.post(
         "/{collection_id}/items",
@@ -227,7 +545,6 @@ def create_collections_router(collections: dict[str, OapifCollection]):
     )
     def create_item(
         request: HttpRequest,
-        response: HttpResponse,
         collection_id: str,
         feature: GenericFeature,
         crs: CRS = Header(CRS("OGC", CRS84_SRID), alias="Content-Crs"),
@@ -247,8 +564,11 @@ def create_collections_router(collections: dict[str, OapifCollection]):
             raise AuthorizationError()
         collection.save_model(request, item, False)
         item = collection.query(request, CRS("OGC", CRS84_SRID)).get(pk=item.pk)
-        response.headers["Location"] = request.build_absolute_uri(f"items/{item.pk}")  # type: ignore
-        return 201, collection.model_to_feature(request, item)
+        response = HttpResponse(
+            collection.model_to_feature_json(request, item), status=201, content_type="application/geo+json"
+        )
+        response.headers["Location"] = request.build_absolute_uri(f"items/{item.pk}")
+        return response
 
     @router.api_operation(
         ["OPTIONS"],
@@ -305,7 +625,7 @@ def create_collections_router(collections: dict[str, OapifCollection]):
             setattr(item, geom_field, geometry)
         collection.save_model(request, item, True)
         item = collection.query(request, CRS("OGC", CRS84_SRID)).get(pk=item_id)
-        return collection.model_to_feature(request, item)
+        return HttpResponse(collection.model_to_feature_json(request, item), content_type="application/geo+json")
 
     @router.patch(
         "/{collection_id}/items/{item_id}",
@@ -339,7 +659,7 @@ def create_collections_router(collections: dict[str, OapifCollection]):
             setattr(item, geom_field, geometry)
         collection.save_model(request, item, True)
         item = collection.query(request, CRS("OGC", CRS84_SRID)).get(pk=item_id)
-        return collection.model_to_feature(request, item)
+        return HttpResponse(collection.model_to_feature_json(request, item), content_type="application/geo+json")
 
     @router.delete("/{collection_id}/items/{item_id}", operation_id="delete_collection_item")
     def delete_item(
@@ -0,0 +1,102 @@
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from typing import Protocol
+
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.cache import patch_vary_headers
+
+from django_oapif.utils import parse_accept
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Buffered responses smaller than this aren't worth compressing
+MIN_SIZE = 200
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes, /) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+def gzip_compressor() -> Compressor:
+    # wbits=31 writes a gzip header and trailer
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+class BrotliCompressor:
+    def __init__(self) -> None:
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=5)  # type: ignore
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.finish()
+
+
+def zstd_compressor() -> Compressor:
+    return zstandard.ZstdCompressor(level=3).compressobj()  # type: ignore
+
+
+# Supported content codings, in order of preference when a client accepts several with the same quality
+COMPRESSORS: dict[str, Callable[[], Compressor]] = {
+    **({"zstd": zstd_compressor} if zstandard else {}),
+    **({"br": BrotliCompressor} if brotli else {}),
+    "gzip": gzip_compressor,
+}
+
+
+def negotiate_encoding(request: HttpRequest, encodings: Iterable[str] = COMPRESSORS) -> str | None:
+    """Return the preferred content coding of `encodings` accepted by `request`, if any."""
+    accepted = parse_accept(request.headers.get("Accept-Encoding", ""))
+    qualities = {encoding: accepted.get(encoding, accepted.get("*", 0.0)) for encoding in encodings}
+    best = max(qualities, key=lambda encoding: qualities[encoding], default=None)
+    return best if best is not None and qualities[best] > 0 else None
+
+
+def compress_chunks(chunks: Iterable[bytes], compressor: Compressor) -> Iterator[bytes]:
+    """Compress a stream incrementally, yielding output as soon as the compressor emits a block."""
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+def set_content_encoding[R: HttpResponseBase](response: R, encoding: str) -> R:
+    response.headers["Content-Encoding"] = encoding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    # A strong ETag identifies the uncompressed representation
+    if (etag := response.headers.get("ETag")) and not etag.startswith("W/"):
+        response.headers["ETag"] = f"W/{etag}"
+    return response
+
+
+def compress_response[R: HttpResponseBase](request: HttpRequest, response: R) -> R:
+    """Compress `response` with the content coding negotiated from the `Accept-Encoding` header of `request`.
+
+    Streaming responses are compressed incrementally as they are sent.
+    """
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if response.has_header("Content-Encoding") or (encoding := negotiate_encoding(request)) is None:
+        return response
+    compressor = COMPRESSORS[encoding]()
+    if isinstance(response, StreamingHttpResponse):
+        response.streaming_content = compress_chunks(response.streaming_content, compressor)  # type: ignore
+        response.headers.pop("Content-Length", None)
+    elif isinstance(response, HttpResponse):
+        if len(response.content) < MIN_SIZE:
+            return response
+        response.content = compressor.compress(response.content) + compressor.flush()
+    else:
+        return response
+    return set_content_encoding(response, encoding)
@@ -0,0 +1,47 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import QuerySet
+
+from django_oapif.versioning import get_version
+
+CACHE_PREFIX = "django_oapif.count"
+
+
+def estimate_count(qs: QuerySet) -> int:
+    """Return the planner's estimate of the number of rows of `qs`, without running it.
+
+    Unfiltered querysets use the table statistics from `pg_class.reltuples`, others the row estimate of `EXPLAIN`.
+    """
+    qs = qs.order_by()
+    connection = connections[qs.db]
+    with connection.cursor() as cursor:
+        if not qs.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(qs.model._meta.db_table)],
+            )
+            # reltuples is -1 (or 0 before PostgreSQL 14) for tables never analyzed
+            if (row := cursor.fetchone()) and row[0] > 0:
+                return row[0]
+        sql, params = qs.query.get_compiler(qs.db).as_sql()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def cached_count(qs: QuerySet, timeout: float | None) -> int:
+    """Return `qs.count()`, cached with Django's cache framework until the model is written to or `timeout` expires.
+
+    Cached counts are keyed on the SQL of the query and the version of the model (see `django_oapif.versioning`),
+    so writes that bypass model signals, eg: `bulk_create()`, don't invalidate them.
+    """
+    qs = qs.order_by()
+    version = get_version(qs.model)
+    sql, params = qs.query.get_compiler(qs.db).as_sql()
+    digest = hashlib.sha256(repr((qs.db, sql, [str(param) for param in params])).encode()).hexdigest()
+    return cache.get_or_set(f"{CACHE_PREFIX}:{qs.model._meta.label_lower}:{version.token}:{digest}", qs.count, timeout)
@@ -0,0 +1,566 @@
+"""CQL2 filters (OGC API Features Part 3), parsed to CQL2-JSON and compiled to Django `Q` objects.
+
+Supports logical operators, comparisons, `LIKE`, `BETWEEN`, `IN`, `IS NULL`, spatial predicates (`S_INTERSECTS`,
+`S_WITHIN`, etc.) on WKT, GeoJSON or `BBOX` literals and temporal predicates (`T_AFTER`, `T_DURING`, etc.) on
+timestamps, dates and intervals. Filters compile to lookups on the fields themselves, so they can use indexes.
+"""
+
+import json
+import operator
+import re
+from collections.abc import Collection
+from functools import reduce
+from typing import Any, Literal
+
+from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+from django.contrib.gis.geos import Polygon as GEOSPolygon
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, ForeignKey, IntegerField, Model, Q
+from ninja.errors import HttpError
+
+from django_oapif.utils import LRUCache
+
+type FilterLang = Literal["cql2-text", "cql2-json"]
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<string>'(?:[^']|'')*')
+        |(?P<number>[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+        |(?P<quoted>"(?:[^"]|"")*")
+        |(?P<operator><>|<=|>=|=|<|>)
+        |(?P<punctuation>[(),])
+        |(?P<identifier>[A-Za-z_][\w:.]*)
+    )""",
+    re.VERBOSE,
+)
+
+COMPARISON_LOOKUPS = {"=": "exact", "<": "lt", "<=": "lte", ">": "gt", ">=": "gte"}
+# The comparison equivalent to `a op b` written as `b op a`
+FLIPPED_COMPARISONS = {"=": "=", "<>": "<>", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+SPATIAL_LOOKUPS = {
+    "s_intersects": "intersects",
+    "s_equals": "equals",
+    "s_disjoint": "disjoint",
+    "s_touches": "touches",
+    "s_within": "within",
+    "s_overlaps": "overlaps",
+    "s_crosses": "crosses",
+    "s_contains": "contains",
+}
+FLIPPED_SPATIAL = {"s_within": "s_contains", "s_contains": "s_within"}
+
+TEMPORAL_OPERATORS = {"t_after", "t_before", "t_during", "t_equals", "t_intersects", "t_disjoint"}
+FLIPPED_TEMPORAL = {"t_after": "t_before", "t_before": "t_after"}
+
+GEOMETRY_TYPES = {
+    "POINT",
+    "LINESTRING",
+    "POLYGON",
+    "MULTIPOINT",
+    "MULTILINESTRING",
+    "MULTIPOLYGON",
+    "GEOMETRYCOLLECTION",
+}
+KEYWORDS = {"AND", "OR", "NOT", "LIKE", "BETWEEN", "IN", "IS", "NULL", "TRUE", "FALSE"}
+
+# Filters nesting more operations are rejected, rather than exhausting the recursion limit
+MAX_DEPTH = 50
+
+# Parsed filters, keyed on (language, filter). Filters are compiled on each request, as they depend on its fields
+parsed_filters: LRUCache[tuple[str, str], Any] = LRUCache(maxsize=256)
+
+
+def invalid_filter(message: str) -> HttpError:
+    return HttpError(400, f"Invalid filter: {message}")
+
+
+class Token:
+    def __init__(self, kind: str, value: str, start: int, end: int) -> None:
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def is_keyword(self, *keywords: str) -> bool:
+        return self.kind == "identifier" and self.value.upper() in keywords
+
+
+def tokenize(text: str) -> list[Token]:
+    tokens = []
+    position = 0
+    while text[position:].strip():
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None or match.lastgroup is None:
+            raise invalid_filter(f"unexpected character at position {len(text) - len(text[position:].lstrip())}")
+        tokens.append(Token(match.lastgroup, match.group(match.lastgroup), match.start(match.lastgroup), match.end()))
+        position = match.end()
+    return tokens
+
+
+class TextParser:
+    """Recursive descent parser of CQL2 text into CQL2-JSON."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = tokenize(text)
+        self.index = 0
+        self.depth = 0
+
+    def peek(self, offset: int = 0) -> Token | None:
+        index = self.index + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def advance(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise invalid_filter("unexpected end")
+        self.index += 1
+        return token
+
+    def expect(self, value: str) -> Token:
+        token = self.advance()
+        if token.value.upper() != value:
+            raise invalid_filter(f"expected {value!r} at position {token.start}, got {token.value!r}")
+        return token
+
+    def accept_keyword(self, *keywords: str) -> bool:
+        token = self.peek()
+        if token is not None and token.is_keyword(*keywords):
+            self.index += 1
+            return True
+        return False
+
+    def nest(self) -> None:
+        """Enter a nested operation, ie: `NOT` or parentheses."""
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise invalid_filter(f"more than {MAX_DEPTH} nested operations")
+
+    def parse(self) -> Any:
+        expression = self.parse_or()
+        if (token := self.peek()) is not None:
+            raise invalid_filter(f"unexpected {token.value!r} at position {token.start}")
+        return expression
+
+    def parse_or(self) -> Any:
+        args = [self.parse_and()]
+        while self.accept_keyword("OR"):
+            args.append(self.parse_and())
+        return args[0] if len(args) == 1 else {"op": "or", "args": args}
+
+    def parse_and(self) -> Any:
+        args = [self.parse_not()]
+        while self.accept_keyword("AND"):
+            args.append(self.parse_not())
+        return args[0] if len(args) == 1 else {"op": "and", "args": args}
+
+    def parse_not(self) -> Any:
+        if self.accept_keyword("NOT"):
+            self.nest()
+            expression = {"op": "not", "args": [self.parse_not()]}
+            self.depth -= 1
+            return expression
+        return self.parse_predicate()
+
+    def parse_predicate(self) -> Any:
+        token = self.peek()
+        if token is not None and token.value == "(":
+            self.advance()
+            self.nest()
+            expression = self.parse_or()
+            self.expect(")")
+            self.depth -= 1
+            return expression
+        following = self.peek(1)
+        if token is not None and token.kind == "identifier" and following is not None and following.value == "(":
+            name = token.value.lower()
+            if name in SPATIAL_LOOKUPS or name in TEMPORAL_OPERATORS:
+                self.index += 2
+                args = [self.parse_operand()]
+                while self.accept_punctuation(","):
+                    args.append(self.parse_operand())
+                self.expect(")")
+                return {"op": name, "args": args}
+
+        left = self.parse_operand()
+        if self.accept_keyword("IS"):
+            negated = self.accept_keyword("NOT")
+            self.expect("NULL")
+            return self.negate({"op": "isNull", "args": [left]}, negated)
+        negated = self.accept_keyword("NOT")
+        if self.accept_keyword("LIKE"):
+            return self.negate({"op": "like", "args": [left, self.parse_operand()]}, negated)
+        if self.accept_keyword("BETWEEN"):
+            low = self.parse_operand()
+            self.expect("AND")
+            return self.negate({"op": "between", "args": [left, low, self.parse_operand()]}, negated)
+        if self.accept_keyword("IN"):
+            self.expect("(")
+            values = [self.parse_operand()]
+            while self.accept_punctuation(","):
+                values.append(self.parse_operand())
+            self.expect(")")
+            return self.negate({"op": "in", "args": [left, values]}, negated)
+        if negated:
+            raise invalid_filter("expected LIKE, BETWEEN or IN after NOT")
+        token = self.peek()
+        if token is not None and token.kind == "operator":
+            self.advance()
+            return {"op": token.value, "args": [left, self.parse_operand()]}
+        if isinstance(left, bool):
+            return left
+        raise invalid_filter(f"expected a predicate at position {token.start if token else len(self.text)}")
+
+    @staticmethod
+    def negate(expression: Any, negated: bool) -> Any:
+        return {"op": "not", "args": [expression]} if negated else expression
+
+    def parse_operand(self) -> Any:
+        token = self.advance()
+        match token.kind:
+            case "string":
+                return token.value[1:-1].replace("''", "'")
+            case "number":
+                return float(token.value) if any(c in token.value for c in ".eE") else int(token.value)
+            case "quoted":
+                return {"property": token.value[1:-1].replace('""', '"')}
+            case "identifier":
+                keyword = token.value.upper()
+                if keyword in ("TRUE", "FALSE"):
+                    return keyword == "TRUE"
+                if keyword in ("TIMESTAMP", "DATE"):
+                    self.expect("(")
+                    value = self.parse_string()
+                    self.expect(")")
+                    return {keyword.lower(): value}
+                if keyword == "INTERVAL":
+                    self.expect("(")
+                    start = self.parse_instant()
+                    self.expect(",")
+                    end = self.parse_instant()
+                    self.expect(")")
+                    return {"interval": [start, end]}
+                if keyword == "BBOX":
+                    self.expect("(")
+                    coordinates = [self.parse_number()]
+                    while self.accept_punctuation(","):
+                        coordinates.append(self.parse_number())
+                    self.expect(")")
+                    return {"bbox": coordinates}
+                if keyword in GEOMETRY_TYPES:
+                    return self.parse_geometry(token)
+                if keyword in KEYWORDS:
+                    raise invalid_filter(f"unexpected {token.value!r} at position {token.start}")
+                return {"property": token.value}
+        raise invalid_filter(f"unexpected {token.value!r} at position {token.start}")
+
+    def accept_punctuation(self, value: str) -> bool:
+        token = self.peek()
+        if token is not None and token.value == value:
+            self.index += 1
+            return True
+        return False
+
+    def parse_string(self) -> str:
+        value = self.parse_operand()
+        if not isinstance(value, str):
+            raise invalid_filter("expected a string")
+        return value
+
+    def parse_number(self) -> float:
+        value = self.parse_operand()
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise invalid_filter("expected a number")
+        return value
+
+    def parse_instant(self) -> str:
+        value = self.parse_operand()
+        if isinstance(value, dict) and len(value) == 1 and ("timestamp" in value or "date" in value):
+            value = next(iter(value.values()))
+        if not isinstance(value, str):
+            raise invalid_filter("expected an instant in an interval")
+        return value
+
+    def parse_geometry(self, token: Token) -> dict[str, Any]:
+        """Parse a WKT literal starting at `token` to a GeoJSON geometry."""
+        depth = 0
+        end = token.end
+        while (current := self.peek()) is not None:
+            if current.value == "(":
+                depth += 1
+            elif current.value == ")" and depth > 0:
+                depth -= 1
+            elif depth == 0 and not current.is_keyword("Z", "EMPTY"):
+                break
+            self.index += 1
+            end = current.end
+            if depth == 0 and (current.value == ")" or current.is_keyword("EMPTY")):
+                break
+        try:
+            return json.loads(GEOSGeometry(self.text[token.start : end]).json)
+        except (GEOSException, ValueError) as e:
+            raise invalid_filter(f"invalid geometry at position {token.start}") from e
+
+
+def parse_filter(text: str, lang: FilterLang = "cql2-text") -> Any:
+    """Parse a CQL2 text or JSON filter to CQL2-JSON, memoized per filter."""
+
+    def parse() -> Any:
+        if lang == "cql2-json":
+            try:
+                expression = json.loads(text)
+            except ValueError as e:
+                raise invalid_filter("malformed JSON") from e
+            except RecursionError as e:
+                raise invalid_filter(f"more than {MAX_DEPTH} nested operations") from e
+            # Each operation nests an object and its arguments, geometry literals up to 5 more levels
+            if get_depth(expression) > 2 * MAX_DEPTH + 5:
+                raise invalid_filter(f"more than {MAX_DEPTH} nested operations")
+            return expression
+        return TextParser(text).parse()
+
+    return parsed_filters.get_or_set((lang, text), parse)
+
+
+class FilterCompiler:
+    """Compiles CQL2-JSON to a `Q` object on the fields of `model`.
+
+    Only `properties` and the `geometry_field` may be referenced. Geometry literals are in `filter_srid`, and
+    transformed to the `srid` of the geometry field so its spatial index can be used.
+
+    As in SQL, predicates on NULL values are neither true nor false: such rows match neither a predicate nor its
+    negation. Negations are pushed down to predicates, which then also require their properties not to be NULL.
+    """
+
+    def __init__(
+        self,
+        model: type[Model],
+        properties: Collection[str],
+        geometry_field: str | None,
+        srid: int | None,
+        filter_srid: int,
+    ) -> None:
+        self.model = model
+        self.properties = properties
+        self.geometry_field = geometry_field
+        self.srid = srid
+        self.filter_srid = filter_srid
+
+    def compile(self, expression: Any, negated: bool = False) -> Q:
+        """Compile `expression`, or `NOT expression` if `negated`."""
+        if isinstance(expression, bool):
+            return Q() if expression != negated else Q(pk__in=[])
+        if not isinstance(expression, dict) or not isinstance(expression.get("args"), list):
+            raise invalid_filter("expected an operation")
+        op, args = expression.get("op"), expression["args"]
+        match op:
+            case "and" | "or" if args:
+                # De Morgan's laws: NOT (a AND b) is NOT a OR NOT b
+                combine = operator.and_ if (op == "and") != negated else operator.or_
+                return reduce(combine, (self.compile(arg, negated) for arg in args))
+            case "not" if len(args) == 1:
+                return self.compile(args[0], not negated)
+        predicate = self.compile_predicate(op, args)
+        if not negated:
+            return predicate
+        not_null = (Q(**{f"{name}__isnull": False}) for name in sorted(get_filter_properties(expression)))
+        return reduce(operator.and_, not_null, ~predicate)
+
+    def compile_predicate(self, op: Any, args: list) -> Q:
+        match op:
+            case "=" | "<>" | "<" | "<=" | ">" | ">=" if len(args) == 2:
+                return self.compile_comparison(op, *args)
+            case "like" if len(args) == 2:
+                name, pattern = self.get_value_property(args[0], op), args[1]
+                if not isinstance(pattern, str):
+                    raise invalid_filter("LIKE expects a string pattern")
+                lookup, value = like_lookup(pattern)
+                return Q(**{f"{name}__{lookup}": value})
+            case "between" if len(args) == 3:
+                name = self.get_value_property(args[0], op)
+                return Q(**{f"{name}__range": (self.get_value(name, args[1]), self.get_value(name, args[2]))})
+            case "in" if len(args) == 2 and isinstance(args[1], list):
+                name = self.get_value_property(args[0], op)
+                return Q(**{f"{name}__in": [self.get_value(name, value) for value in args[1]]})
+            case "isNull" if len(args) == 1:
+                return Q(**{f"{self.get_property(args[0])}__isnull": True})
+            case _ if op in SPATIAL_LOOKUPS and len(args) == 2:
+                return self.compile_spatial(op, *args)
+            case _ if op in TEMPORAL_OPERATORS and len(args) == 2:
+                return self.compile_temporal(op, *args)
+        raise invalid_filter(f"unsupported operation {op!r}")
+
+    def compile_comparison(self, op: str, left: Any, right: Any) -> Q:
+        if not is_property(left):
+            if not is_property(right):
+                raise invalid_filter(f"{op!r} compares no property")
+            op, left, right = FLIPPED_COMPARISONS[op], right, left
+        name = self.get_value_property(left, op)
+        value = F(self.get_value_property(right, op)) if is_property(right) else self.get_value(name, right)
+        if op == "<>":
+            # As in SQL, NULL values are neither equal nor different
+            return ~Q(**{name: value}) & Q(**{f"{name}__isnull": False})
+        return Q(**{f"{name}__{COMPARISON_LOOKUPS[op]}": value})
+
+    def compile_spatial(self, op: str, left: Any, right: Any) -> Q:
+        if not is_property(left):
+            op, left, right = FLIPPED_SPATIAL.get(op, op), right, left
+        name = self.get_property(left)
+        if name != self.geometry_field:
+            raise invalid_filter(f"{op.upper()} expects the geometry property {self.geometry_field!r}")
+        geometry = self.get_geometry(right)
+        expression = geometry if geometry.srid == self.srid else Transform(geometry, self.srid)
+        return Q(**{f"{name}__{SPATIAL_LOOKUPS[op]}": expression})
+
+    def compile_temporal(self, op: str, left: Any, right: Any) -> Q:
+        if not is_property(left):
+            op, left, right = FLIPPED_TEMPORAL.get(op, op), right, left
+        name = self.get_value_property(left, op)
+        if isinstance(right, dict) and isinstance(right.get("interval"), list) and len(right["interval"]) == 2:
+            start, end = (None if bound == ".." else self.get_value(name, bound) for bound in right["interval"])
+            conditions: list[Q] = []
+            match op:
+                case "t_after":
+                    conditions = [Q(**{f"{name}__gt": end})] if end is not None else [Q(pk__in=[])]
+                case "t_before":
+                    conditions = [Q(**{f"{name}__lt": start})] if start is not None else [Q(pk__in=[])]
+                case "t_during":
+                    conditions = [Q(**{f"{name}__gt": start})] if start is not None else []
+                    conditions += [Q(**{f"{name}__lt": end})] if end is not None else []
+                case "t_intersects" | "t_disjoint":
+                    conditions = [Q(**{f"{name}__gte": start})] if start is not None else []
+                    conditions += [Q(**{f"{name}__lte": end})] if end is not None else []
+                case _:
+                    raise invalid_filter(f"{op.upper()} doesn't apply to an instant property and an interval")
+            within = reduce(operator.and_, conditions, Q(**{f"{name}__isnull": False}))
+            return ~within & Q(**{f"{name}__isnull": False}) if op == "t_disjoint" else within
+        value = self.get_value(name, right)
+        match op:
+            case "t_after":
+                return Q(**{f"{name}__gt": value})
+            case "t_before":
+                return Q(**{f"{name}__lt": value})
+            case "t_equals" | "t_intersects":
+                return Q(**{name: value})
+            case "t_disjoint":
+                return ~Q(**{name: value}) & Q(**{f"{name}__isnull": False})
+        raise invalid_filter(f"{op.upper()} doesn't apply to instants")
+
+    def get_property(self, expression: Any) -> str:
+        if not is_property(expression):
+            raise invalid_filter(f"expected a property, got {json.dumps(expression)}")
+        name = expression["property"]
+        if name not in self.properties and name != self.geometry_field:
+            raise invalid_filter(f"unknown property {name!r}")
+        return name
+
+    def get_value_property(self, expression: Any, op: str) -> str:
+        """Return the name of a property compared to values by `op`, which doesn't apply to geometries."""
+        name = self.get_property(expression)
+        if name == self.geometry_field:
+            raise invalid_filter(f"{op.upper()} doesn't apply to the geometry property {name!r}")
+        return name
+
+    def get_value(self, name: str, value: Any) -> Any:
+        """Convert a literal to the Python value of the `name` field, validating it."""
+        if isinstance(value, dict) and len(value) == 1 and ("timestamp" in value or "date" in value):
+            value = next(iter(value.values()))
+        if isinstance(value, (dict, list)):
+            raise invalid_filter(f"unsupported value {json.dumps(value)}")
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        # `to_python` truncates numbers and booleans to integers, which would silently change the filter
+        target = field.target_field if isinstance(field, ForeignKey) else field
+        if isinstance(target, IntegerField) and (
+            isinstance(value, bool) or (isinstance(value, float) and not value.is_integer())
+        ):
+            raise invalid_filter(f"invalid value {value!r} for {name!r}")
+        try:
+            return field.to_python(value)
+        except ValidationError as e:
+            raise invalid_filter(f"invalid value {value!r} for {name!r}") from e
+
+    def get_geometry(self, value: Any) -> GEOSGeometry:
+        if isinstance(value, dict) and isinstance(value.get("bbox"), list):
+            bbox = value["bbox"]
+            if len(bbox) not in (4, 6) or not all(isinstance(c, (int, float)) for c in bbox):
+                raise invalid_filter("BBOX expects 4 or 6 numbers")
+            half = len(bbox) // 2
+            geometry = GEOSPolygon.from_bbox((bbox[0], bbox[1], bbox[half], bbox[half + 1]))
+        elif isinstance(value, dict) and "type" in value:
+            try:
+                geometry = GEOSGeometry(json.dumps(value))
+            except (GEOSException, ValueError) as e:
+                raise invalid_filter("invalid GeoJSON geometry") from e
+        else:
+            raise invalid_filter(f"expected a geometry, got {json.dumps(value)}")
+        geometry.srid = self.filter_srid
+        return geometry
+
+
+def get_filter_properties(expression: Any) -> set[str]:
+    """Return the names of the properties referenced by a CQL2-JSON expression."""
+    if is_property(expression):
+        return {expression["property"]}
+    if isinstance(expression, dict):
+        expression = list(expression.values())
+    if isinstance(expression, list):
+        return set().union(*map(get_filter_properties, expression))
+    return set()
+
+
+def get_depth(expression: Any) -> int:
+    """Return the number of nested JSON objects and arrays of a CQL2-JSON expression, without recursing."""
+    depth = 0
+    stack = [(expression, 0)]
+    while stack:
+        value, level = stack.pop()
+        if isinstance(value, (dict, list)):
+            depth = max(depth, level + 1)
+            stack.extend((item, level + 1) for item in (value.values() if isinstance(value, dict) else value))
+    return depth
+
+
+def is_property(expression: Any) -> bool:
+    return isinstance(expression, dict) and isinstance(expression.get("property"), str)
+
+
+def like_lookup(pattern: str) -> tuple[str, str]:
+    """Translate a `LIKE` pattern to a Django lookup and its value, preferring prefix matches over regexes.
+
+    `%` matches any string and `_` any character, backslashes escape them.
+    """
+    parts: list[str | None] = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            parts.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in "%_":
+            parts.append(None if char == "%" else "")
+        else:
+            parts.append(char)
+    # `None` stands for `%` and `""` for `_`
+    if "" not in parts:
+        leading = parts[:1] == [None]
+        trailing = len(parts) > 1 and parts[-1:] == [None]
+        inner = parts[int(leading) : len(parts) - int(trailing)]
+        if None not in inner:
+            literal = "".join(inner)  # type: ignore
+            match leading, trailing:
+                case False, False:
+                    return "exact", literal
+                case False, True:
+                    return "startswith", literal
+                case True, False:
+                    return "endswith", literal
+                case True, True:
+                    return "contains", literal
+    regex = "".join(".*" if part is None else "." if part == "" else re.escape(part) for part in parts)
+    return "regex", f"^{regex}$"
@@ -1,13 +1,25 @@
+import math
 import re
 from dataclasses import dataclass
 from typing import Any
 
+from django.contrib.gis.db.models.fields import get_srid_info
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, connections
 from pydantic import GetCoreSchemaHandler
 from pydantic_core import PydanticCustomError, core_schema
 
 CRS84_SRID = 4326
 CRS84_URI = "http://www.opengis.net/def/crs/OGC/1.3/CRS84"
 
+# Coordinates are output with enough decimal digits to resolve about a millimetre
+COORDINATE_RESOLUTION = 0.001
+EARTH_RADIUS = 6_378_137
+# Used for CRSs whose units are unknown, the AsGeoJSON default
+FALLBACK_PRECISION = 8
+# The "standardized rendering pixel size" of OGC WMTS, converting scale denominators to lengths
+PIXEL_SIZE = 0.00028
+
 # taken from https://github.com/geopython/pygeoapi/blob/953b6fa74d2ce292d8f566c4f4d3bcb4161d6e95/pygeoapi/util.py#L90
 CRS_URI_PATTERN = re.compile(r"^http://www.opengis\.net/def/crs/(?P<auth>EPSG|OGC)/[\d|\.]+?/(?P<code>\w+?)$")
 
@@ -17,6 +29,12 @@ class CRS:
     auth: str
     srid: int
 
+    @property
+    def uri(self) -> str:
+        if self.auth == "OGC":
+            return CRS84_URI
+        return f"http://www.opengis.net/def/crs/{self.auth}/0/{self.srid}"
+
     @classmethod
     def __get_pydantic_core_schema__(cls, _source: Any, _handler: GetCoreSchemaHandler):
 
@@ -60,3 +78,25 @@ class BBox:
             validate_bbox,
             core_schema.str_schema(),
         )
+
+
+def get_metres_per_unit(srid: int, using: str = DEFAULT_DB_ALIAS) -> float | None:
+    """Return the length of a unit of `srid` in metres, at the equator for angular units, or None if unknown."""
+    try:
+        info = get_srid_info(srid, connections[using])
+    except ObjectDoesNotExist:
+        return None
+    if not info.units:
+        return None
+    # Angular units are in radians
+    return info.units * EARTH_RADIUS if info.geodetic else info.units
+
+
+def get_default_precision(srid: int, using: str = DEFAULT_DB_ALIAS) -> int:
+    """Return the number of decimal digits resolving `COORDINATE_RESOLUTION` metres in the units of `srid`.
+
+    Eg: 3 for metres, 8 for degrees.
+    """
+    if (metres_per_unit := get_metres_per_unit(srid, using)) is None:
+        return FALLBACK_PRECISION
+    return max(0, round(math.log10(metres_per_unit / COORDINATE_RESOLUTION)))
@@ -0,0 +1,214 @@
+import abc
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple
+
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from ninja.errors import HttpError
+
+from django_oapif.crs import CRS
+from django_oapif.export import EXPORT_CONTENT_TYPES, ExportFormat, is_export_available
+from django_oapif.handler import OapifCollection, RenderedPage
+from django_oapif.utils import parse_accept
+
+
+class Items(NamedTuple):
+    """The items requested from a collection, as passed to encoders."""
+
+    # Every item matching the request filters, as returned by `OapifCollection.query`
+    query: QuerySet
+    # The requested page, selecting one more row telling whether a next page exists
+    page: QuerySet
+    limit: int
+    # The keyset pagination ordering, if any
+    key: tuple[str, ...]
+    # Returns the `numberMatched` and `links` of a page
+    get_trailer: Callable[[RenderedPage], dict[str, Any]]
+    crs: CRS
+    # The requested properties, as validated by `OapifCollection.get_output_fields`, or None for all of them
+    properties: tuple[str, ...] | None = None
+
+
+class Encoder(abc.ABC):
+    """An output format of collection items, selected with the `f` parameter or the `Accept` header.
+
+    Attributes:
+        name:
+            The value of the `f` parameter selecting the format.
+        media_type:
+            The content type of responses, matched against the `Accept` header.
+        paginated:
+            If False, responses hold all the items matching the request filters, from `Items.query`, and
+            requests with pagination parameters are rejected.
+        compressible:
+            If True, responses are compressed following `OapifCollection.compress_responses`.
+        cacheable:
+            If True, responses are stored by the `OapifCollection.response_cache`.
+        ranges:
+            If True, responses from the `OapifCollection.response_cache` answer HTTP range requests.
+        requires_geometry:
+            If True, geometries can't be skipped with the `skipGeometry` parameter.
+    """
+
+    name: str
+    media_type: str
+    paginated: bool = True
+    compressible: bool = True
+    cacheable: bool = True
+    ranges: bool = False
+    requires_geometry: bool = False
+
+    def supports(self, collection: OapifCollection) -> bool:
+        """Return whether `collection` can be encoded to this format."""
+        return True
+
+    def is_streamed(self, collection: OapifCollection) -> bool:
+        """Return whether responses are streamed as they are encoded, unless they are cached."""
+        return False
+
+    @abc.abstractmethod
+    def encode(self, request: HttpRequest, collection: OapifCollection, items: Items) -> Iterable[str | bytes]:
+        """Encode `items` in chunks."""
+
+
+class GeoJSONEncoder(Encoder):
+    name = "json"
+    media_type = "application/geo+json"
+
+    def is_streamed(self, collection: OapifCollection) -> bool:
+        return collection.stream_items and not collection.render_in_database
+
+    def encode(self, request: HttpRequest, collection: OapifCollection, items: Items) -> Iterable[str]:
+        if collection.render_in_database:
+            content = collection.render_featurecollection_in_database(
+                request, items.page, items.get_trailer, limit=items.limit, key=items.key, properties=items.properties
+            )
+            return [content]
+        return collection.render_featurecollection(
+            request,
+            items.page,
+            items.get_trailer,
+            limit=items.limit,
+            key=items.key,
+            stream=self.is_streamed(collection),
+            properties=items.properties,
+        )
+
+
+class FeatureSequenceEncoder(Encoder):
+    """Encodes features one per line, so clients can process them as soon as they arrive."""
+
+    def __init__(self, name: str, media_type: str, *, record_separator: bool) -> None:
+        self.name = name
+        self.media_type = media_type
+        self.record_separator = record_separator
+
+    def is_streamed(self, collection: OapifCollection) -> bool:
+        return True
+
+    def encode(self, request: HttpRequest, collection: OapifCollection, items: Items) -> Iterable[str]:
+        return collection.render_featuresequence(
+            request,
+            items.page,
+            items.get_trailer,
+            limit=items.limit,
+            key=items.key,
+            stream=True,
+            properties=items.properties,
+            record_separator=self.record_separator,
+        )
+
+
+class FlatGeobufEncoder(Encoder):
+    """Encodes all the matching items to a FlatGeobuf file, whose index lets clients read parts with range requests."""
+
+    name = "fgb"
+    media_type = "application/flatgeobuf"
+    paginated = False
+    compressible = False
+    ranges = True
+    requires_geometry = True
+
+    def supports(self, collection: OapifCollection) -> bool:
+        return collection.geometry_field is not None
+
+    def encode(self, request: HttpRequest, collection: OapifCollection, items: Items) -> Iterable[bytes]:
+        return [collection.render_flatgeobuf(request, items.query, items.crs, properties=items.properties)]
+
+
+class CSVEncoder(Encoder):
+    """Encodes all the matching items as CSV rows, geometries following `OapifCollection.csv_geometry`."""
+
+    name = "csv"
+    media_type = "text/csv"
+    paginated = False
+    cacheable = False
+
+    def is_streamed(self, collection: OapifCollection) -> bool:
+        return True
+
+    def encode(self, request: HttpRequest, collection: OapifCollection, items: Items) -> Iterable[bytes]:
+        return collection.render_csv(request, items.query, properties=items.properties)
+
+
+class ColumnarEncoder(Encoder):
+    """Exports all the matching items to GeoParquet or an Arrow IPC stream, requiring the `export` extra."""
+
+    paginated = False
+    cacheable = False
+
+    def __init__(self, output_format: ExportFormat) -> None:
+        self.name = self.output_format = output_format
+        self.media_type = EXPORT_CONTENT_TYPES[output_format]
+        # Parquet files are compressed column by column
+        self.compressible = output_format != "parquet"
+
+    def supports(self, collection: OapifCollection) -> bool:
+        return is_export_available()
+
+    def is_streamed(self, collection: OapifCollection) -> bool:
+        return True
+
+    def encode(self, request: HttpRequest, collection: OapifCollection, items: Items) -> Iterable[bytes]:
+        return collection.export(request, items.query, items.crs, self.output_format, properties=items.properties)
+
+
+# Output formats of items, by name, the first one being the default
+ENCODERS: dict[str, Encoder] = {}
+
+
+def register_encoder[E: Encoder](encoder: E) -> E:
+    """Make an output format available to collections, replacing any other with the same name."""
+    ENCODERS[encoder.name] = encoder
+    return encoder
+
+
+register_encoder(GeoJSONEncoder())
+register_encoder(FeatureSequenceEncoder("geojsonseq", "application/geo+json-seq", record_separator=True))
+register_encoder(FeatureSequenceEncoder("ndjson", "application/x-ndjson", record_separator=False))
+register_encoder(FlatGeobufEncoder())
+register_encoder(CSVEncoder())
+register_encoder(ColumnarEncoder("parquet"))
+register_encoder(ColumnarEncoder("arrow"))
+
+
+def get_collection_encoders(collection: OapifCollection) -> dict[str, Encoder]:
+    """Return the encoders enabled by `collection.output_formats` that support it, the first one being the default."""
+    names = ENCODERS if collection.output_formats is None else collection.output_formats
+    return {name: ENCODERS[name] for name in names if name in ENCODERS and ENCODERS[name].supports(collection)}
+
+
+def negotiate_encoder(request: HttpRequest, f: str | None, encoders: dict[str, Encoder]) -> Encoder:
+    """Return the encoder named by the `f` parameter, or else negotiated from the `Accept` header."""
+    if f is not None:
+        if f not in ENCODERS:
+            raise HttpError(400, f"Unknown output format {f!r}")
+        if f not in encoders:
+            raise HttpError(406, f"Output format {f!r} is not available for this collection")
+        return encoders[f]
+    if not encoders:
+        raise HttpError(406, "No output format is available for this collection")
+    accepted = parse_accept(request.headers.get("Accept", ""))
+    qualities = {name: accepted.get(encoder.media_type, 0.0) for name, encoder in encoders.items()}
+    best = max(qualities, key=lambda name: qualities[name])
+    return encoders[best] if qualities[best] > 0 else next(iter(encoders.values()))
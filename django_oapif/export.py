@@ -0,0 +1,204 @@
+import io
+import itertools
+import json
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, Literal
+
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import AsWKB
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, ForeignKey, QuerySet, TextField
+from django.db.models.functions import Cast
+
+from django_oapif.crs import CRS84_SRID
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyproj
+except ImportError:
+    pa = pq = pyproj = None
+
+type ExportFormat = Literal["parquet", "arrow"]
+
+EXPORT_CONTENT_TYPES: dict[ExportFormat, str] = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXPORT_FILE_EXTENSIONS: dict[ExportFormat, str] = {"parquet": "parquet", "arrow": "arrows"}
+
+GEOPARQUET_VERSION = "1.1.0"
+GEOMETRY_TYPES = {
+    "POINT": "Point",
+    "LINESTRING": "LineString",
+    "POLYGON": "Polygon",
+    "MULTIPOINT": "MultiPoint",
+    "MULTILINESTRING": "MultiLineString",
+    "MULTIPOLYGON": "MultiPolygon",
+    "GEOMETRYCOLLECTION": "GeometryCollection",
+}
+
+
+def is_export_available() -> bool:
+    return pa is not None
+
+
+def arrow_type(field: Any) -> "pa.DataType":
+    """Return the Arrow type of the values of a model field, strings being dictionary-encoded."""
+    if isinstance(field, ForeignKey):
+        field = field.target_field
+    match field.get_internal_type() if field is not None else None:
+        case "BooleanField":
+            return pa.bool_()
+        case "SmallIntegerField" | "PositiveSmallIntegerField" | "SmallAutoField":
+            return pa.int16()
+        case "IntegerField" | "PositiveIntegerField" | "AutoField":
+            return pa.int32()
+        case "BigIntegerField" | "PositiveBigIntegerField" | "BigAutoField":
+            return pa.int64()
+        case "FloatField":
+            return pa.float64()
+        case "DecimalField":
+            return pa.decimal128(field.max_digits, field.decimal_places)
+        case "DateField":
+            return pa.date32()
+        case "DateTimeField":
+            return pa.timestamp("us", tz="UTC")
+        case "TimeField":
+            return pa.time64("us")
+        case "BinaryField":
+            return pa.binary()
+    # Other values, eg: UUIDs or JSON, are exported as text
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def geometry_metadata(field: GeometryField, srid: int) -> dict[str, Any]:
+    """Return the GeoParquet metadata of a geometry column holding WKB geometries of `field` in `srid`."""
+    geometry_type = GEOMETRY_TYPES.get(field.geom_type.upper())
+    metadata: dict[str, Any] = {
+        "encoding": "WKB",
+        "geometry_types": [f"{geometry_type} Z" if field.dim == 3 else geometry_type] if geometry_type else [],
+    }
+    # OGC:CRS84 is the default CRS of GeoParquet
+    if srid != CRS84_SRID:
+        metadata["crs"] = pyproj.CRS.from_epsg(srid).to_json_dict()
+    return metadata
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file object buffering what is written until it is taken, to stream files as they are written."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_record_batches(
+    qs: QuerySet, properties: Sequence[str], geometry: tuple[str, str] | None, schema: "pa.Schema", batch_size: int
+) -> Iterator["pa.RecordBatch"]:
+    """Yield the rows of `qs` as Arrow record batches of `schema`, fetched from a server-side cursor.
+
+    `geometry` is a pair of the name of the geometry column and of an annotation or alias holding the geometries.
+    Rows are transposed to columns batch by batch, so a single batch is held in memory at once.
+    """
+    columns: list[Any] = []
+    for name in properties:
+        # Text values are cast by the database, eg: UUIDs or JSON, instead of being converted in Python
+        is_text = pa.types.is_dictionary(schema.field(name).type)
+        columns.append(Cast(F(name), TextField()) if is_text else F(name))
+    if geometry:
+        columns.append(AsWKB(F(geometry[1])))
+    rows = qs.values_list(*columns).iterator(chunk_size=batch_size)
+    for batch in itertools.batched(rows, batch_size):
+        arrays = []
+        for field, values in zip(schema, zip(*batch)):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            elif pa.types.is_binary(field.type):
+                arrays.append(pa.array([None if value is None else bytes(value) for value in values], pa.binary()))
+            else:
+                arrays.append(pa.array(values, field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def get_schema(qs: QuerySet, properties: Sequence[str], geometry: tuple[str, str] | None, srid: int) -> "pa.Schema":
+    """Return the Arrow schema of an export, with GeoParquet metadata and a GeoArrow WKB geometry column."""
+    fields = []
+    for name in properties:
+        try:
+            model_field = qs.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            model_field = None
+        fields.append(pa.field(name, arrow_type(model_field)))
+    metadata = {}
+    if geometry:
+        geometry_column = geometry[0]
+        field_metadata = geometry_metadata(qs.model._meta.get_field(geometry_column), srid)
+        extension_metadata = {"crs": field_metadata["crs"]} if "crs" in field_metadata else {}
+        fields.append(
+            pa.field(
+                geometry_column,
+                pa.binary(),
+                metadata={
+                    "ARROW:extension:name": "geoarrow.wkb",
+                    "ARROW:extension:metadata": json.dumps(extension_metadata),
+                },
+            )
+        )
+        metadata[b"geo"] = json.dumps({
+            "version": GEOPARQUET_VERSION,
+            "primary_column": geometry_column,
+            "columns": {geometry_column: field_metadata},
+        })
+    return pa.schema(fields, metadata=metadata)
+
+
+def write_batches(
+    batches: Iterable["pa.RecordBatch"], schema: "pa.Schema", output_format: ExportFormat
+) -> Iterator[bytes]:
+    """Yield a GeoParquet file or an Arrow IPC stream in chunks, each record batch being written as it comes."""
+    sink = ChunkSink()
+    if output_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def export_columnar(
+    qs: QuerySet,
+    properties: Sequence[str],
+    geometry: tuple[str, str] | None,
+    *,
+    srid: int,
+    output_format: ExportFormat,
+    batch_size: int,
+) -> Iterator[bytes]:
+    """Export features to a GeoParquet file or an Arrow IPC stream, yielded in chunks.
+
+    `geometry` is a pair of the name of the geometry field and of an annotation or alias holding the geometries in
+    `srid`, exported as WKB. String columns are dictionary-encoded.
+    """
+    schema = get_schema(qs, properties, geometry, srid)
+    return write_batches(iter_record_batches(qs, properties, geometry, schema, batch_size), schema, output_format)
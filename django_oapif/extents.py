@@ -0,0 +1,91 @@
+from functools import partial
+
+from django.contrib.gis.db.models import Extent
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+
+type ExtentTuple = tuple[float, float, float, float]
+
+CACHE_PREFIX = "django_oapif.extent"
+
+ESTIMATED_EXTENT_SQL = """
+SELECT ST_XMin(extent), ST_YMin(extent), ST_XMax(extent), ST_YMax(extent)
+FROM ST_EstimatedExtent(%s, %s) AS extent
+"""
+
+
+def compute_extent(model: type[Model], geometry_field: str) -> ExtentTuple | None:
+    """Return the extent of all the geometries of `model`, with an `Extent` aggregate."""
+    return model._default_manager.aggregate(extent=Extent(geometry_field))["extent"]
+
+
+def estimate_extent(model: type[Model], geometry_field: str) -> ExtentTuple | None:
+    """Return the extent of `model` estimated by `ST_EstimatedExtent` from the table statistics.
+
+    Falls back to `compute_extent` when the table has never been analyzed.
+    """
+    db = router.db_for_read(model)
+    column = model._meta.get_field(geometry_field).column
+    with connections[db].cursor() as cursor:
+        cursor.execute(ESTIMATED_EXTENT_SQL, [model._meta.db_table, column])
+        extent = cursor.fetchone()
+    if extent is None or extent[0] is None:
+        return compute_extent(model, geometry_field)
+    return extent
+
+
+def get_extent_key(model: type[Model], geometry_field: str) -> str:
+    return f"{CACHE_PREFIX}:{model._meta.label_lower}:{geometry_field}"
+
+
+def cached_extent(model: type[Model], geometry_field: str, timeout: float | None) -> ExtentTuple | None:
+    """Return `compute_extent`, cached with Django's cache framework.
+
+    The cached extent is widened when instances are saved, and recomputed after deletions or once `timeout`
+    expires. Writes that bypass model signals, eg: `QuerySet.update()`, are only taken into account then.
+    """
+    # Empty tables are cached as an empty tuple
+    extent = cache.get_or_set(
+        get_extent_key(model, geometry_field), lambda: compute_extent(model, geometry_field) or (), timeout
+    )
+    return tuple(extent) or None
+
+
+def widen_cached_extent(sender: type[Model], instance: Model, *, geometry_field: str, timeout: float | None, **kwargs):
+    """Signal receiver widening the cached extent of `sender` with the geometry of a saved instance."""
+    geometry: GEOSGeometry | None = getattr(instance, geometry_field)
+    key = get_extent_key(sender, geometry_field)
+    if geometry is None or geometry.empty or (extent := cache.get(key)) is None:
+        return
+    srid = sender._meta.get_field(geometry_field).srid
+    if geometry.srid and geometry.srid != srid:
+        geometry = geometry.transform(srid, clone=True)
+    xmin, ymin, xmax, ymax = geometry.extent
+    if extent:
+        xmin, ymin, xmax, ymax = min(xmin, extent[0]), min(ymin, extent[1]), max(xmax, extent[2]), max(ymax, extent[3])
+    cache.set(key, (xmin, ymin, xmax, ymax), timeout)
+
+
+def invalidate_cached_extent(sender: type[Model], *, geometry_field: str, **kwargs) -> None:
+    """Signal receiver dropping the cached extent of `sender`, an extent can't be shrunk incrementally."""
+    cache.delete(get_extent_key(sender, geometry_field))
+
+
+def connect_cached_extent_updates(model: type[Model], geometry_field: str, timeout: float | None) -> None:
+    """Keep the cached extent of `model` up to date when its instances are saved or deleted."""
+    dispatch_uid = get_extent_key(model, geometry_field)
+    post_save.connect(
+        partial(widen_cached_extent, geometry_field=geometry_field, timeout=timeout),
+        sender=model,
+        weak=False,
+        dispatch_uid=dispatch_uid,
+    )
+    post_delete.connect(
+        partial(invalidate_cached_extent, geometry_field=geometry_field),
+        sender=model,
+        weak=False,
+        dispatch_uid=dispatch_uid,
+    )
@@ -0,0 +1,30 @@
+from django.contrib.gis.db.models.functions import GeomOutputGeoFunc
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """Simplify a geometry with `ST_SimplifyPreserveTopology`, `tolerance` being in the units of its CRS."""
+
+    function = "ST_SimplifyPreserveTopology"
+
+    def __init__(self, expression, tolerance: float, **extra):
+        super().__init__(expression, self._handle_param(tolerance, "tolerance", (int, float)), **extra)
+
+
+class AsMVTGeom(GeomOutputGeoFunc):
+    """Transform a geometry to the coordinate space of a vector tile with `ST_AsMVTGeom`, clipping it to `bounds`.
+
+    The geometry and `bounds` must share the CRS of the tile, `buffer` is in tile grid units.
+    """
+
+    function = "ST_AsMVTGeom"
+    geom_param_pos = (0, 1)
+
+    def __init__(self, expression, bounds, extent: int = 4096, buffer: int = 256, **extra):
+        super().__init__(
+            expression,
+            bounds,
+            self._handle_param(extent, "extent", int),
+            self._handle_param(buffer, "buffer", int),
+            True,
+            **extra,
+        )
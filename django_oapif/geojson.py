@@ -89,7 +89,7 @@ class FeatureCollection[F: Feature](Schema):
     bbox: tuple[float, float, float, float] | None
     links: list[OAPIFLink]
     numberReturned: int
-    numberMatched: int
+    numberMatched: int | None = None
 
 
 GenericGeometry = Geometry[Coordinate] | None
@@ -1,31 +1,47 @@
-import math
+import hashlib
+import json
+from collections.abc import Callable, Generator, Iterator
 from functools import cache
-from typing import Literal, cast, overload
+from typing import Any, Literal, NamedTuple, cast, overload
 
 from django.contrib.auth import get_permission_codename
 from django.contrib.gis.db.models import GeometryField
 from django.contrib.gis.db.models.functions import AsGeoJSON, Transform
 from django.contrib.gis.geos import Polygon as GEOSPolygon
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router
 from django.db.models import (
+    Count,
+    F,
     FileField,
     ForeignKey,
     GeneratedField,
-    JSONField,
+    IntegerField,
     ManyToManyRel,
     ManyToOneRel,
     Model,
+    Q,
     QuerySet,
+    Window,
 )
-from django.db.models.functions import Cast
 from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from django.utils.cache import quote_etag
 from ninja import ModelSchema, Schema
-from ninja.errors import ValidationError
+from ninja.errors import HttpError, ValidationError
 from ninja.schema import NinjaGenerateJsonSchema
 from pydantic import ConfigDict
 from pydantic import ValidationError as PydanticValidationError
 from pydantic.config import ExtraValues
 
-from django_oapif.crs import CRS, BBox
+from django_oapif.cache import ResponseCache
+from django_oapif.compression import compress_response
+from django_oapif.counting import cached_count, estimate_count
+from django_oapif.cql2 import FilterCompiler, FilterLang, get_filter_properties, parse_filter
+from django_oapif.crs import CRS, PIXEL_SIZE, BBox, get_default_precision, get_metres_per_unit
+from django_oapif.export import ExportFormat, export_columnar
+from django_oapif.extents import ExtentTuple, cached_extent, compute_extent, estimate_extent
+from django_oapif.functions import SimplifyPreserveTopology
 from django_oapif.geojson import (
     Coordinate2D,
     Coordinate3D,
@@ -41,7 +57,18 @@ from django_oapif.geojson import (
     Point,
     Polygon,
 )
-from django_oapif.utils import PatchSchema
+from django_oapif.indexes import acquire_rate, introspect_indexed_fields
+from django_oapif.rendering import (
+    empty_flatgeobuf,
+    iterate_with_extent,
+    render_csv,
+    render_features_in_database,
+    render_flatgeobuf_in_database,
+)
+from django_oapif.serializers import FeatureSerializer
+from django_oapif.tiles import render_tile
+from django_oapif.utils import LRUCache, PatchSchema
+from django_oapif.versioning import get_version
 
 model_config = {
     "from_attributes": True,
@@ -50,6 +77,33 @@ model_config = {
     "loc_by_alias": False,
 }
 
+type OutputSchemaKey = tuple[str, tuple[str, ...], tuple[str, ...], bool]
+
+
+class RenderedPage(NamedTuple):
+    number_returned: int
+    last_key: tuple | None
+    has_more: bool
+    # The `COUNT(*) OVER()` of the page query, when annotated by `query(count_over=True)` and not empty
+    number_matched: int | None = None
+
+
+class OutputSchemas(NamedTuple):
+    feature: type[Feature]
+    featurecollection: type[FeatureCollection]
+    properties: type[Schema]
+    serializer: FeatureSerializer
+
+
+# Compiled output schemas, keyed on (collection id, fields, exclude, geometry). Building a ModelSchema and
+# parametrizing Feature/FeatureCollection with it is expensive, so it is done once per field set.
+output_schemas: LRUCache[OutputSchemaKey, OutputSchemas] = LRUCache(maxsize=256)
+# Serializers of client-selected `properties`, keyed on (collection id, properties, geometry). They need no pydantic
+# schema, and are kept apart so arbitrary selections don't evict the output schemas of configured field sets.
+feature_serializers: LRUCache[tuple[str, tuple[str, ...], bool], FeatureSerializer] = LRUCache(maxsize=256)
+# Queryables JSON schemas, keyed on (collection id, output fields)
+queryables: LRUCache[tuple[str, tuple[str, ...]], dict[str, Any]] = LRUCache(maxsize=256)
+
 
 class OapifCollection[M: Model]:
     """
@@ -73,6 +127,98 @@ class OapifCollection[M: Model]:
             The list of fields to be excluded from the feature properties.exclude:
         ordering:
             The field used to sort the queryset.
+        pagination:
+            `"offset"` (default) or `"keyset"`. With keyset pagination, items are sorted by `ordering` then by
+            primary key, and `next` links carry an opaque `cursor` resuming after the last returned item, so deep
+            pages cost as much as the first one. `offset` is still accepted, and used for `prev` links.
+        count_strategy:
+            How `numberMatched` is computed for item pages: `"exact"` (default) counts the matching items,
+            `"window"` counts them with `COUNT(*) OVER()` in the page query itself, saving a round trip (with a
+            plain count when the page is empty), `"estimated"` uses the PostgreSQL planner estimate, `"cached"`
+            caches exact counts with Django's cache framework until the model is saved or deleted (or
+            `count_cache_timeout` expires), and `"none"` omits `numberMatched`. `next` links never depend on it.
+        count_cache_timeout:
+            The number of seconds counts are cached for with the `"cached"` strategy, `None` to cache them until
+            invalidated.
+        extent_strategy:
+            How the spatial extent listed in the collection metadata is computed: `"cached"` (default) caches an
+            `Extent` aggregate with Django's cache framework, widened when features are saved and recomputed after
+            deletions or once `extent_cache_timeout` expires, `"estimated"` uses PostGIS' `ST_EstimatedExtent`
+            from the table statistics, and `"exact"` runs the `Extent` aggregate on every request.
+        extent_cache_timeout:
+            The number of seconds extents are cached for with the `"cached"` strategy, `None` to cache them until
+            invalidated.
+        conditional_get:
+            If True, item responses carry an `ETag` and a `Last-Modified` header derived from the version of the
+            model (see `django_oapif.versioning`), and requests with a matching `If-None-Match` or
+            `If-Modified-Since` header get a `304 Not Modified` before any feature query runs. Versions are kept in
+            Django's cache framework, which must be shared by all processes serving the API.
+        response_cache:
+            A `ResponseCache` storing rendered item pages, FlatGeobuf exports and tiles until the model is written
+            to, eg: for read-only collections served to many anonymous users. Cached pages are not streamed, cached
+            FlatGeobuf exports answer HTTP range requests.
+        compress_responses:
+            If True, read responses are compressed with the content coding negotiated from the `Accept-Encoding`
+            header: `zstd` and `br` (when the `zstandard` and `brotli` packages are installed) or `gzip`.
+            Streamed item pages are compressed as they are sent. Compressed responses get `Vary: Accept-Encoding`
+            and their strong `ETag`s are made weak. Off by default, eg: when a reverse proxy already compresses.
+        coordinate_precision:
+            The number of decimal digits of output coordinates, when not given by the `precision` request
+            parameter. If not defined, it is derived from the units of the output CRS to resolve about a
+            millimetre, eg: 3 for metres and 8 for degrees.
+        simplification:
+            If True (default), clients may request geometries simplified with `ST_SimplifyPreserveTopology`, with
+            the `simplify` (a tolerance in output CRS units) or `scale-denominator` items parameters.
+        max_simplification:
+            The maximum simplification tolerance in metres, `None` for no limit.
+        tile_fields:
+            The fields encoded as attributes of vector tile features, by minimum zoom level, eg:
+            `{0: ("name",), 12: ("name", "type")}`. Tiles below the lowest zoom level carry no attributes.
+            If not defined, tiles carry the same properties as items.
+        tile_max_age:
+            The number of seconds clients may cache vector tiles for, in a `Cache-Control` header. Tiles served to
+            authenticated users are only cached privately.
+        flatgeobuf_index:
+            If True (default), FlatGeobuf item exports include a packed Hilbert R-tree index, so clients can read
+            only the features in a bbox with range requests (see `response_cache`).
+        flatgeobuf_max_features:
+            The maximum number of features of FlatGeobuf item exports, larger ones are answered with a 400 asking
+            for a narrower `bbox` or `filter`. Files are rendered in one PostgreSQL value, which can't exceed 1 GB,
+            and buffered in memory. Range requests are only answered without rendering the file again when it fits
+            in the `max_entry_size` of the `response_cache`. `None` disables the limit.
+        export_batch_size:
+            The number of rows fetched from the database, and written as one record batch or row group, at once
+            when exporting a collection to GeoParquet or Arrow IPC.
+        csv_geometry:
+            How geometries are rendered in CSV item exports (`f=csv`): `"wkt"` (default), `"wkb"` for hex-encoded
+            WKB, or `None` to omit them.
+        output_formats:
+            The names of the item output formats offered by the collection, selected with the `f` parameter or the
+            `Accept` header, the first one being the default, eg: `("json", "fgb")`. If not defined, all the
+            formats of `django_oapif.encoders.ENCODERS` supporting the collection are offered.
+        unindexed_filters:
+            How CQL2 filters referencing properties that lead no database index (see `get_indexed_fields`) are
+            handled, as they may need a sequential scan: `"allow"` (default), `"reject"` with a 400, or
+            `"throttle"` to allow at most `unindexed_filter_rate` of them per minute, with a 429 afterwards.
+            Throttling counters are kept in Django's cache framework, shared by all clients.
+        unindexed_filter_rate:
+            The number of requests filtering on properties without index allowed per minute with the `"throttle"`
+            strategy.
+        feature_bbox:
+            If True, each feature geometry includes its own `bbox`. The bbox of the whole page is always
+            computed by the database.
+        render_in_database:
+            If True, item pages are rendered to GeoJSON by PostgreSQL and returned as-is, skipping model
+            instantiation and serialization in Python. Property values are then rendered by PostgreSQL's
+            JSON functions, eg: file fields are returned as their stored name instead of their URL.
+            Only applies to FeatureCollections.
+        stream_items:
+            If True, item pages are streamed feature by feature, fetching rows from a server-side cursor
+            in batches of `stream_chunk_size`. `numberMatched`, `links` and `bbox` are written after the features.
+            Ignored when `render_in_database` is set. Feature sequences (`f=geojsonseq` or `f=ndjson`) are always
+            streamed.
+        stream_chunk_size:
+            The number of rows fetched from the database at once when streaming items.
     """
 
     id: str
@@ -84,6 +230,30 @@ class OapifCollection[M: Model]:
     readonly_fields: tuple[str, ...] = ()
     exclude: tuple[str, ...] = ()
     ordering = ()
+    pagination: Literal["offset", "keyset"] = "offset"
+    count_strategy: Literal["exact", "window", "estimated", "cached", "none"] = "exact"
+    count_cache_timeout: float | None = 300
+    extent_strategy: Literal["exact", "cached", "estimated"] = "cached"
+    extent_cache_timeout: float | None = 3600
+    conditional_get: bool = False
+    response_cache: ResponseCache | None = None
+    compress_responses: bool = False
+    coordinate_precision: int | None = None
+    simplification: bool = True
+    max_simplification: float | None = None
+    tile_fields: dict[int, tuple[str, ...]] | None = None
+    tile_max_age: int = 3600
+    flatgeobuf_index: bool = True
+    flatgeobuf_max_features: int | None = 100_000
+    export_batch_size: int = 10000
+    csv_geometry: Literal["wkt", "wkb"] | None = "wkt"
+    output_formats: tuple[str, ...] | None = None
+    unindexed_filters: Literal["allow", "throttle", "reject"] = "allow"
+    unindexed_filter_rate: int = 10
+    feature_bbox: bool = False
+    render_in_database: bool = False
+    stream_items: bool = False
+    stream_chunk_size: int = 2000
 
     def __init__(self, model: type[M]) -> None:
         cls = type(self)
@@ -126,29 +296,115 @@ class OapifCollection[M: Model]:
         self.foreign_key_fields = {
             field.name: field.remote_field.model for field in model_fields if isinstance(field, ForeignKey)
         }
+        self._indexed_fields: frozenset[str] | None = None
 
     @overload
-    def query(self, request: HttpRequest, crs: CRS): ...
+    def query(
+        self,
+        request: HttpRequest,
+        crs: CRS,
+        *,
+        precision: int | None = None,
+        simplify: float | None = None,
+        count_over: bool = False,
+        properties: tuple[str, ...] | None = None,
+        skip_geometry: bool = False,
+        filter: Q | None = None,
+    ): ...
 
     @overload
-    def query(self, request: HttpRequest, crs: CRS, bbox: BBox | None, bbox_crs: CRS): ...
+    def query(
+        self,
+        request: HttpRequest,
+        crs: CRS,
+        bbox: BBox | None,
+        bbox_crs: CRS,
+        *,
+        precision: int | None = None,
+        simplify: float | None = None,
+        count_over: bool = False,
+        properties: tuple[str, ...] | None = None,
+        skip_geometry: bool = False,
+        filter: Q | None = None,
+    ): ...
 
     def query(
-        self, request: HttpRequest, crs: CRS, bbox: BBox | None = None, bbox_crs: CRS | None = None
+        self,
+        request: HttpRequest,
+        crs: CRS,
+        bbox: BBox | None = None,
+        bbox_crs: CRS | None = None,
+        *,
+        precision: int | None = None,
+        simplify: float | None = None,
+        count_over: bool = False,
+        properties: tuple[str, ...] | None = None,
+        skip_geometry: bool = False,
+        filter: Q | None = None,
     ) -> QuerySet[M]:
+        """Return the queryset of features in `crs`, filtered by `bbox` and `filter` (see `get_filter`).
+
+        Geometries are simplified with a `simplify` tolerance in `crs` units, if any, and rendered with `precision`
+        decimal digits, or `get_coordinate_precision` if None. The page extent uses unsimplified geometries.
+
+        With `count_over`, rows are annotated with `_oapif_number_matched`, the number of rows matching the query
+        computed by `COUNT(*) OVER()` before any slicing, so a page and the total come back in a single query.
+
+        With `properties`, as validated by `get_output_fields`, only those fields are loaded. With `skip_geometry`,
+        geometries are neither transformed nor rendered (see `has_geometry`), `bbox` still filters features.
+        """
         qs = self.get_queryset(request)
-        qs = qs.only("pk", *self.get_fields(request))
+        qs = qs.only("pk", *(self.get_fields(request) if properties is None else properties))
         if geom_field := self.geometry_field:
-            geometry_query = geom_field if crs.srid == self.srid else Transform(geom_field, crs.srid)
-            qs = qs.annotate(_oapif_geometry=Cast(AsGeoJSON(geometry_query, bbox=True), JSONField()))
+            geometry_query = F(geom_field) if crs.srid == self.srid else Transform(geom_field, crs.srid)
+            # The geometry is kept as GeoJSON text and spliced as-is in the rendered features,
+            # the aliased output geometry is only selected when computing the page extent
+            if not skip_geometry:
+                qs = qs.alias(_oapif_output_geometry=geometry_query).annotate(
+                    _oapif_geometry=AsGeoJSON(
+                        SimplifyPreserveTopology(geometry_query, simplify) if simplify else geometry_query,
+                        bbox=self.feature_bbox,
+                        precision=self.get_coordinate_precision(request, crs) if precision is None else precision,
+                    )
+                )
             if bbox is not None:
                 assert bbox_crs is not None
                 bbox_geom = GEOSPolygon.from_bbox((bbox.xmin, bbox.ymin, bbox.xmax, bbox.ymax))
                 bbox_geom.srid = bbox_crs.srid
                 bbox_expr = bbox_geom if bbox_geom.srid == self.srid else Transform(bbox_geom, self.srid)
                 qs = qs.filter(**{f"{geom_field}__intersects": bbox_expr})
+        if filter is not None:
+            qs = qs.filter(filter)
+        if count_over:
+            qs = qs.annotate(_oapif_number_matched=Window(Count("*")))
         return qs
 
+    def get_filter(self, request: HttpRequest, filter: str, filter_lang: FilterLang, filter_crs: CRS) -> Q:
+        """Compile a CQL2 filter on the output fields and the geometry, its geometries being in `filter_crs`.
+
+        Filters on properties without index are rejected or throttled following `unindexed_filters`.
+        """
+        expression = parse_filter(filter, filter_lang)
+        compiler = FilterCompiler(
+            self.model, self.get_output_fields(request), self.geometry_field, self.srid, filter_crs.srid
+        )
+        # Compiled first, so invalid filters get their own error and don't count against the rate
+        q = compiler.compile(expression)
+        if self.unindexed_filters != "allow":
+            if unindexed := sorted(get_filter_properties(expression) - self.get_indexed_fields()):
+                names = ", ".join(unindexed)
+                if self.unindexed_filters == "reject":
+                    raise HttpError(400, f"Filtering on properties without index is not allowed: {names}")
+                if not acquire_rate(f"{self.id}:unindexed", self.unindexed_filter_rate):
+                    raise HttpError(429, f"Too many requests filtering on properties without index: {names}")
+        return q
+
+    def get_indexed_fields(self) -> frozenset[str]:
+        """Return the fields whose column leads a database index, introspected once per collection."""
+        if self._indexed_fields is None:
+            self._indexed_fields = introspect_indexed_fields(self.model, router.db_for_read(self.model))
+        return self._indexed_fields
+
     def get_queryset(self, request: HttpRequest) -> QuerySet[M]:
         """Return the model queryset."""
         qs = self.model._default_manager.get_queryset()
@@ -163,18 +419,69 @@ class OapifCollection[M: Model]:
         """
         return self.ordering
 
+    def get_coordinate_precision(self, request: HttpRequest, crs: CRS) -> int:
+        """Return the default number of decimal digits of coordinates output in `crs`."""
+        if self.coordinate_precision is not None:
+            return self.coordinate_precision
+        return get_default_precision(crs.srid, self.model._default_manager.db)
+
+    def get_simplify_tolerance(
+        self, request: HttpRequest, crs: CRS, simplify: float | None, scale_denominator: float | None
+    ) -> float | None:
+        """Return the simplification tolerance in `crs` units for the `simplify` and `scale-denominator` parameters.
+
+        A scale denominator is converted to the length of a rendered pixel. The tolerance is capped by
+        `max_simplification`, and None when `simplification` is disabled.
+        """
+        if not self.simplification or (simplify is None and scale_denominator is None):
+            return None
+        metres_per_unit = get_metres_per_unit(crs.srid, self.model._default_manager.db)
+        if simplify is None:
+            if metres_per_unit is None:
+                return None
+            simplify = scale_denominator * PIXEL_SIZE / metres_per_unit  # type: ignore
+        if self.max_simplification is not None and metres_per_unit is not None:
+            simplify = min(simplify, self.max_simplification / metres_per_unit)
+        return simplify
+
+    def get_keyset(self, request) -> tuple[str, ...]:
+        """
+        Return the ordering used for keyset pagination: `get_ordering` followed by the primary key.
+        """
+        ordering = tuple(self.get_ordering(request))
+        if not all(isinstance(name, str) and name != "?" for name in ordering):
+            raise ImproperlyConfigured(f"Keyset pagination of {self.id} requires an ordering made of field names.")
+        pk_names = {"pk", "-pk", self.opts.pk.name, f"-{self.opts.pk.name}"}
+        return ordering if pk_names & set(ordering) else (*ordering, "pk")
+
     def get_fields(self, request, obj=None) -> tuple[str, ...]:
         """
         Hook for specifying fields.
         """
         return self.fields
 
+    def get_tile_fields(self, request: HttpRequest, z: int) -> tuple[str, ...]:
+        """Return the fields encoded as attributes of vector tile features at zoom level `z`."""
+        exclude = self.get_exclude(request)
+        if self.tile_fields is None:
+            fields = self.get_fields(request)
+        else:
+            min_zoom = max((zoom for zoom in self.tile_fields if zoom <= z), default=None)
+            fields = () if min_zoom is None else self.tile_fields[min_zoom]
+        return tuple(field for field in fields if field not in exclude)
+
     def get_exclude(self, request, obj=None) -> tuple[str, ...]:
         """
         Hook for specifying fields.
         """
         return self.exclude
 
+    def get_output_fields(self, request: HttpRequest, properties: tuple[str, ...] | None = None) -> tuple[str, ...]:
+        """Return the fields output as feature properties, narrowed to the requested `properties` if any."""
+        exclude = self.get_exclude(request)
+        fields = tuple(field for field in self.get_fields(request) if field not in exclude)
+        return fields if properties is None else tuple(field for field in properties if field in fields)
+
     def get_readonly_fields(self, request, obj=None) -> tuple[str, ...]:
         """
         Hook for specifying custom readonly fields.
@@ -287,11 +594,73 @@ class OapifCollection[M: Model]:
         return FeaturePatch[GeometrySchema, PatchSchema[PropertiesSchema]]
 
     def get_feature_output_schema(self, request: HttpRequest) -> type[Feature]:
-        fields = tuple(set(self.get_fields(request)) - set(self.get_exclude(request)))
+        return self.get_output_schemas(self.get_fields(request), self.get_exclude(request)).feature
+
+    def get_featurecollection_output_schema(self, request: HttpRequest) -> type[FeatureCollection]:
+        return self.get_output_schemas(self.get_fields(request), self.get_exclude(request)).featurecollection
+
+    def get_properties_output_schema(self, request: HttpRequest) -> type[Schema]:
+        return self.get_output_schemas(self.get_fields(request), self.get_exclude(request)).properties
+
+    def get_feature_serializer(
+        self, request: HttpRequest, properties: tuple[str, ...] | None = None, *, geometry: bool = True
+    ) -> FeatureSerializer:
+        if properties is None:
+            return self.get_output_schemas(self.get_fields(request), self.get_exclude(request), geometry).serializer
+        geometry = geometry and self.geometry_field is not None
+        return feature_serializers.get_or_set(
+            (self.id, properties, geometry),
+            lambda: FeatureSerializer(self.model, properties, "_oapif_geometry" if geometry else None),
+        )
+
+    def get_output_schemas(
+        self, fields: tuple[str, ...], exclude: tuple[str, ...], geometry: bool = True
+    ) -> OutputSchemas:
+        """Return the output Feature and FeatureCollection schemas for a field set, compiling them on first use.
+
+        Without `geometry`, features have a null geometry.
+        """
+        fields, exclude = tuple(fields), tuple(exclude)
+        geometry = geometry and self.geometry_field is not None
+        return output_schemas.get_or_set(
+            (self.id, fields, exclude, geometry), lambda: self._build_output_schemas(fields, exclude, geometry)
+        )
+
+    def _build_output_schemas(
+        self, fields: tuple[str, ...], exclude: tuple[str, ...], geometry: bool = True
+    ) -> OutputSchemas:
+        properties_fields = tuple(field for field in fields if field not in exclude)
         # extra="ignore" is required for the serialization to go through ninja DjangoGetter
-        PropertiesSchema = self.get_properties_schema(fields, extra="ignore")
-        GeometrySchema = self.get_geometry_schema()
-        return Feature[GeometrySchema, PropertiesSchema]
+        PropertiesSchema = self.get_properties_schema(properties_fields, extra="ignore")
+        GeometrySchema = self.get_geometry_schema() if geometry else None
+        FeatureSchema = Feature[GeometrySchema, PropertiesSchema]
+        serializer = FeatureSerializer(self.model, properties_fields, "_oapif_geometry" if geometry else None)
+        return OutputSchemas(FeatureSchema, FeatureCollection[FeatureSchema], PropertiesSchema, serializer)
+
+    def warm_up(self) -> None:
+        """Compile the output schemas for the default field set, so the first request doesn't pay for it."""
+        self.get_output_schemas(self.fields, self.exclude)
+
+    def get_queryables(self, request: HttpRequest) -> dict[str, Any]:
+        """Return the JSON schema of the properties CQL2 filters may reference, cached per field set.
+
+        Properties are annotated with `x-oapif-indexed`, telling whether their column leads a database index.
+        """
+        fields = self.get_output_fields(request)
+        return queryables.get_or_set((self.id, fields), lambda: self._build_queryables(request, fields))
+
+    def _build_queryables(self, request: HttpRequest, fields: tuple[str, ...]) -> dict[str, Any]:
+        schema = self.get_json_schema(request)
+        indexed_fields = self.get_indexed_fields()
+        schema["properties"] = {
+            name: {**field_schema, "x-oapif-indexed": name in indexed_fields}
+            for name, field_schema in schema["properties"].items()
+            if name in fields or name == self.geometry_field
+        }
+        schema.pop("required", None)
+        schema["type"] = "object"
+        schema["additionalProperties"] = False
+        return schema
 
     def get_json_schema(self, request: HttpRequest) -> dict:
         properties_schema = self.get_properties_schema(self.get_fields(request))
@@ -329,30 +698,282 @@ class OapifCollection[M: Model]:
         schema["title"] = self.title
         return schema
 
-    def queryset_to_featurecollection(self, request: HttpRequest, qs: QuerySet) -> FeatureCollection:
-        features: list[Feature] = []
-        bbox = (math.inf, math.inf, -math.inf, -math.inf)
-        FeatureSchema = self.get_feature_output_schema(request)
-        FeatureCollectionSchema = FeatureCollection[FeatureSchema]
-        for obj in qs:
-            feature = self._model_to_feature(request, FeatureSchema, obj)
-            features.append(feature)
-            if geometry := feature.geometry:
-                bbox = (
-                    min(bbox[0], geometry.bbox[0]),
-                    min(bbox[1], geometry.bbox[1]),
-                    max(bbox[2], geometry.bbox[2]),
-                    max(bbox[3], geometry.bbox[3]),
-                )
-        if bbox == (math.inf, math.inf, -math.inf, -math.inf):
-            bbox = None
-        return FeatureCollectionSchema.model_construct(
-            type="FeatureCollection",
-            features=features,
-            bbox=bbox,
-            numberMatched=len(features),
-            numberReturned=len(features),
-            links=[],
+    def render_featurecollection(
+        self,
+        request: HttpRequest,
+        qs: QuerySet,
+        get_trailer: Callable[[RenderedPage], dict[str, Any]],
+        *,
+        limit: int | None = None,
+        key: tuple[str, ...] = (),
+        stream: bool = False,
+        properties: tuple[str, ...] | None = None,
+    ) -> Iterator[str]:
+        """Yield a GeoJSON FeatureCollection in chunks, see `render_features`."""
+        yield '{"type":"FeatureCollection","features":['
+        trailer = yield from self.render_features(
+            request, qs, get_trailer, limit=limit, key=key, stream=stream, properties=properties, separator=","
+        )
+        yield "]," + json.dumps(trailer, separators=(",", ":"))[1:]
+
+    def render_featuresequence(
+        self,
+        request: HttpRequest,
+        qs: QuerySet,
+        get_trailer: Callable[[RenderedPage], dict[str, Any]],
+        *,
+        limit: int | None = None,
+        key: tuple[str, ...] = (),
+        stream: bool = False,
+        properties: tuple[str, ...] | None = None,
+        record_separator: bool = True,
+    ) -> Iterator[str]:
+        """Yield GeoJSON features one per line, in chunks, see `render_features`.
+
+        Records start with an ASCII record separator when `record_separator` is True, as GeoJSON text sequences
+        (RFC 8142), otherwise they are newline-delimited. The trailer is the last record, an empty FeatureCollection
+        carrying `numberReturned`, `links`, etc., so the sequence only holds GeoJSON objects.
+        """
+        prefix = "\x1e" if record_separator else ""
+        trailer = yield from self.render_features(
+            request,
+            qs,
+            get_trailer,
+            limit=limit,
+            key=key,
+            stream=stream,
+            properties=properties,
+            prefix=prefix,
+            suffix="\n",
+        )
+        trailer = {"type": "FeatureCollection", "features": [], **trailer}
+        yield prefix + json.dumps(trailer, separators=(",", ":")) + "\n"
+
+    def render_features(
+        self,
+        request: HttpRequest,
+        qs: QuerySet,
+        get_trailer: Callable[[RenderedPage], dict[str, Any]],
+        *,
+        limit: int | None = None,
+        key: tuple[str, ...] = (),
+        stream: bool = False,
+        properties: tuple[str, ...] | None = None,
+        prefix: str = "",
+        separator: str = "",
+        suffix: str = "",
+    ) -> Generator[str, None, dict[str, Any]]:
+        """Yield the features of a page serialized to GeoJSON, and return the members of its trailer.
+
+        Each feature is wrapped in `prefix` and `suffix`, and features are joined with `separator`.
+        At most `limit` features are rendered: `qs` may select one more row, telling whether a next page exists.
+        `get_trailer` is called once all features have been written, with the `RenderedPage` holding their number,
+        the values of the `key` fields for the last one and whether more rows followed. It returns the members to
+        add to the trailer (eg: `numberMatched` and `links`). When `stream` is True, rows are fetched from a
+        server-side cursor so the whole page is never held in memory. With `properties`, as validated by
+        `get_output_fields`, only those properties are rendered.
+        """
+        has_geometry = self.has_geometry(qs)
+        serializer = self.get_feature_serializer(request, properties, geometry=has_geometry)
+        count_over = "_oapif_number_matched" in qs.query.annotations
+        columns = [
+            *serializer.columns,
+            *(["_oapif_number_matched"] if count_over else []),
+            *(F(name.removeprefix("-")) for name in key),
+        ]
+        chunk_size = self.stream_chunk_size if stream else None
+        if has_geometry:
+            # Each row is followed by the extent of the page so far, so the page bbox comes with its last row
+            rows = iterate_with_extent(qs, columns, "_oapif_output_geometry", chunk_size=chunk_size)
+        else:
+            values = qs.values_list(*columns)
+            rows = values.iterator(chunk_size=chunk_size) if stream else values
+        number_returned = 0
+        last_row = None
+        has_more = False
+        for row in rows:
+            if number_returned == limit:
+                has_more = True
+                break
+            yield (separator if number_returned else "") + prefix + serializer.serialize(row) + suffix
+            number_returned += 1
+            last_row = row
+        last_key = number_matched = bbox = None
+        if last_row is not None:
+            key_start = len(serializer.columns) + count_over
+            last_key = tuple(last_row[key_start : key_start + len(key)])
+            number_matched = last_row[len(serializer.columns)] if count_over else None
+            if has_geometry and last_row[-4] is not None:
+                bbox = tuple(last_row[-4:])
+        return {
+            "numberReturned": number_returned,
+            **get_trailer(RenderedPage(number_returned, last_key, has_more, number_matched)),
+            "bbox": bbox,
+        }
+
+    def get_number_matched(self, request: HttpRequest, qs: QuerySet) -> int | None:
+        """Return the `numberMatched` of a query as returned by `query`, following `count_strategy`."""
+        match self.count_strategy:
+            case "exact" | "window":
+                return qs.count()
+            case "estimated":
+                return estimate_count(qs)
+            case "cached":
+                return cached_count(qs, self.count_cache_timeout)
+            case "none":
+                return None
+        raise ImproperlyConfigured(f"Unknown count_strategy {self.count_strategy!r} for {self.id}.")
+
+    def get_extent(self, request: HttpRequest) -> ExtentTuple | None:
+        """Return the extent of all the features in the storage CRS, following `extent_strategy`."""
+        if not self.geometry_field:
+            return None
+        match self.extent_strategy:
+            case "exact":
+                return compute_extent(self.model, self.geometry_field)
+            case "cached":
+                return cached_extent(self.model, self.geometry_field, self.extent_cache_timeout)
+            case "estimated":
+                return estimate_extent(self.model, self.geometry_field)
+        raise ImproperlyConfigured(f"Unknown extent_strategy {self.extent_strategy!r} for {self.id}.")
+
+    def get_validators(self, request: HttpRequest) -> tuple[str, int] | None:
+        """Return the `ETag` and the `Last-Modified` timestamp of the response to `request`, if `conditional_get`.
+
+        They only depend on the version of the model, the request URL, the `Accept` header and the user, so they
+        are known before any feature query runs.
+        """
+        if not self.conditional_get:
+            return None
+        version = get_version(self.model)
+        user = getattr(request, "user", None)
+        key = (
+            self.id,
+            version.token,
+            request.get_full_path(),
+            request.headers.get("Accept", ""),
+            getattr(user, "pk", None),
+        )
+        return quote_etag(hashlib.sha256(repr(key).encode()).hexdigest()[:32]), version.last_modified
+
+    def compress[R: HttpResponseBase](self, request: HttpRequest, response: R) -> R:
+        """Compress a read response if `compress_responses`."""
+        return compress_response(request, response) if self.compress_responses else response
+
+    def has_geometry(self, qs: QuerySet) -> bool:
+        """Return whether features as returned by `query` carry geometries, ie: without `skip_geometry`."""
+        return "_oapif_output_geometry" in qs.query.annotations
+
+    def render_featurecollection_in_database(
+        self,
+        request: HttpRequest,
+        qs: QuerySet,
+        get_trailer: Callable[[RenderedPage], dict[str, Any]],
+        *,
+        limit: int,
+        key: tuple[str, ...] = (),
+        properties: tuple[str, ...] | None = None,
+    ) -> str:
+        """Render a GeoJSON FeatureCollection with a single PostgreSQL query, see `render_features`.
+
+        Features are rendered by PostgreSQL, and the trailer is appended once the query tells what the page holds.
+        """
+        count_over = "_oapif_number_matched" in qs.query.annotations
+        geometry = ("_oapif_geometry", "_oapif_output_geometry") if self.has_geometry(qs) else None
+        page = render_features_in_database(
+            qs,
+            self.get_output_fields(request, properties),
+            geometry,
+            limit=limit,
+            key=key,
+            number_matched="_oapif_number_matched" if count_over else None,
+        )
+        number_returned = min(page.number_fetched, limit)
+        has_more = page.number_fetched > limit
+        trailer = {
+            "numberReturned": number_returned,
+            **get_trailer(RenderedPage(number_returned, page.last_key, has_more, page.number_matched)),
+            "bbox": page.bbox,
+        }
+        return (
+            '{"type":"FeatureCollection","features":'
+            + page.features
+            + ","
+            + json.dumps(trailer, separators=(",", ":"))[1:]
+        )
+
+    def render_flatgeobuf(
+        self, request: HttpRequest, qs: QuerySet, crs: CRS, *, properties: tuple[str, ...] | None = None
+    ) -> bytes:
+        """Render features as returned by `query` in `crs` to a FlatGeobuf file, in one query.
+
+        Raises a 400 when there are more than `flatgeobuf_max_features`.
+        """
+        assert self.geometry_field is not None
+        max_features = self.flatgeobuf_max_features
+        content, number_rendered = render_flatgeobuf_in_database(
+            qs,
+            self.get_output_fields(request, properties),
+            "_oapif_output_geometry",
+            index=self.flatgeobuf_index,
+            # One more feature tells whether there are too many
+            limit=None if max_features is None else max_features + 1,
+        )
+        if max_features is not None and number_rendered > max_features:
+            raise HttpError(400, f"FlatGeobuf exports are limited to {max_features} features, use a bbox or filter")
+        if not number_rendered:
+            return empty_flatgeobuf(self.opts.get_field(self.geometry_field).geom_type, crs.srid)  # type: ignore
+        return content
+
+    def render_csv(
+        self, request: HttpRequest, qs: QuerySet, *, properties: tuple[str, ...] | None = None
+    ) -> Iterator[bytes]:
+        """Render features as returned by `query` to CSV, in chunks, geometries following `csv_geometry`.
+
+        Raises a 400 when there is no column to render, eg: no selected property and skipped geometries.
+        """
+        properties = self.get_output_fields(request, properties)
+        geometry = None
+        if self.geometry_field and self.csv_geometry and self.has_geometry(qs):
+            geometry = (self.geometry_field, "_oapif_output_geometry")
+        if not properties and geometry is None:
+            raise HttpError(400, "CSV output requires at least one property or the geometry")
+        return render_csv(
+            qs, properties, geometry, geometry_format=self.csv_geometry or "wkt", chunk_size=self.stream_chunk_size
+        )
+
+    def export(
+        self,
+        request: HttpRequest,
+        qs: QuerySet,
+        crs: CRS,
+        output_format: ExportFormat,
+        *,
+        properties: tuple[str, ...] | None = None,
+    ) -> Iterator[bytes]:
+        """Export features as returned by `query` in `crs` to a GeoParquet file or an Arrow IPC stream, in chunks.
+
+        Properties are the same as those of output features.
+        """
+        properties = self.get_output_fields(request, properties)
+        geometry = (self.geometry_field, "_oapif_output_geometry") if self.has_geometry(qs) else None
+        return export_columnar(
+            qs, properties, geometry, srid=crs.srid, output_format=output_format, batch_size=self.export_batch_size
+        )
+
+    def render_tile(self, request: HttpRequest, z: int, x: int, y: int) -> bytes:
+        """Render the features of `get_queryset` in a WebMercatorQuad tile as a Mapbox Vector Tile, in one query."""
+        assert self.geometry_field is not None
+        qs = self.get_queryset(request).order_by()
+        return render_tile(
+            qs,
+            self.get_tile_fields(request, z),
+            self.geometry_field,
+            z,
+            x,
+            y,
+            layer=self.id,
+            feature_id=isinstance(self.opts.pk, IntegerField),
         )
 
     def model_to_feature(self, request: HttpRequest, obj: M) -> Feature:
@@ -360,13 +981,22 @@ class OapifCollection[M: Model]:
         return self._model_to_feature(request, schema, obj)
 
     def _model_to_feature(self, request: HttpRequest, schema: type[Feature], obj: M) -> Feature:
+        geometry = getattr(obj, "_oapif_geometry", None)
         return schema(
             type="Feature",
             id=str(obj.pk),
-            geometry=getattr(obj, "_oapif_geometry", None),
+            geometry=json.loads(geometry) if isinstance(geometry, str) else geometry,
             properties=obj,
         )
 
+    def model_to_feature_json(self, request: HttpRequest, obj: M) -> str:
+        """Render a model instance, as returned by `query`, to a GeoJSON Feature string.
+
+        Values come from our own database and are not validated, the geometry is spliced verbatim from
+        the AsGeoJSON output.
+        """
+        return self.get_feature_serializer(request).serialize_instance(obj)
+
     def validate_feature_input_or_raise(self, request: HttpRequest, feature: Feature) -> Feature:
         schema = self.get_feature_input_schema(request)
         return self.validate_feature_or_raise(request, schema, feature)
@@ -0,0 +1,41 @@
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Model
+
+CACHE_PREFIX = "django_oapif.throttle"
+
+
+def introspect_indexed_fields(model: type[Model], using: str) -> frozenset[str]:
+    """Return the fields of `model` whose column leads a database index, as introspected from the database.
+
+    Only leading columns are considered, as they are the ones a filter on the field alone can use.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    # Expression indexes have no column name
+    leading_columns = {
+        constraint["columns"][0]
+        for constraint in constraints.values()
+        if (constraint["index"] or constraint["unique"] or constraint["primary_key"]) and constraint["columns"]
+    }
+    return frozenset(field.name for field in model._meta.concrete_fields if field.column in leading_columns)
+
+
+def acquire_rate(key: str, rate: int, period: int = 60) -> bool:
+    """Count a request against a limit of `rate` requests per `period` seconds, and return whether it is allowed.
+
+    Counters are kept in Django's cache framework, which must be shared by all processes serving the API.
+    """
+    window = int(time.time() // period)
+    cache_key = f"{CACHE_PREFIX}:{key}:{window}"
+    cache.add(cache_key, 0, period)
+    try:
+        count = cache.incr(cache_key)
+    except ValueError:
+        # The counter expired in between
+        cache.add(cache_key, 1, period)
+        count = 1
+    return count <= rate
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+from django_oapif.crs import CRS, CRS84_SRID
+from django_oapif.export import EXPORT_FILE_EXTENSIONS, is_export_available
+
+
+class Command(BaseCommand):
+    help = "Export a collection to a GeoParquet file or an Arrow IPC stream"
+
+    def add_arguments(self, parser):
+        parser.add_argument("api", help="Dotted path to the OAPIF instance, eg: myproject.oapif.oapif")
+        parser.add_argument("collection", help="The collection identifier")
+        parser.add_argument("output", help="The path of the exported file")
+        parser.add_argument(
+            "-f",
+            "--format",
+            choices=EXPORT_FILE_EXTENSIONS,
+            help="The output format, inferred from the output extension if not given (default: parquet)",
+        )
+        parser.add_argument("-s", "--srid", type=int, default=CRS84_SRID, help="SRID of the output CRS")
+        parser.add_argument("-u", "--username", help="Export the collection as seen by this user")
+
+    def handle(self, *args, **options):
+        if not is_export_available():
+            raise CommandError("Columnar exports require the `export` extra")
+        try:
+            collection = import_string(options["api"]).collections[options["collection"]]
+        except (ImportError, KeyError) as e:
+            raise CommandError(f"Collection {options['collection']} not found: {e}")
+
+        output_format = options["format"]
+        if output_format is None:
+            extension = options["output"].rpartition(".")[2]
+            output_format = next((name for name, ext in EXPORT_FILE_EXTENSIONS.items() if ext == extension), "parquet")
+
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        if username := options["username"]:
+            User = get_user_model()
+            try:
+                request.user = User._default_manager.get_by_natural_key(username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username} not found")
+
+        crs = CRS("OGC" if options["srid"] == CRS84_SRID else "EPSG", options["srid"])
+        size = 0
+        with open(options["output"], "wb") as output:
+            for chunk in collection.export(request, collection.query(request, crs), crs, output_format):
+                size += output.write(chunk)
+        self.stdout.write(f"Exported {collection.id} to {options['output']} ({size:,} bytes)")
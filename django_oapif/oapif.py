@@ -20,8 +20,10 @@ from django_oapif.collections import (
     create_collections_router,
 )
 from django_oapif.conformance import create_conformance_router
+from django_oapif.extents import connect_cached_extent_updates
 from django_oapif.handler import OapifCollection
 from django_oapif.root import create_root_router
+from django_oapif.versioning import connect_version_updates
 
 
 class OAPIF:
@@ -86,20 +88,25 @@ class OAPIF:
         """Register a model to expose as an OGC API Features collection."""
 
         for model in models if isinstance(models, Iterable) else [models]:
-            collection = oapif_class(model)
-            self.collections[collection.id] = collection
+            self._add_collection(oapif_class(model))
 
     def register[T: OapifCollection](self, *models: type[Model]) -> Callable[[type[T]], type[T]]:
         """Register a model to expose as an OGC API Features collection."""
 
         def wrapper(oapif_class: type[T]) -> type[T]:
             for model in models:
-                collection = oapif_class(model)
-                self.collections[collection.id] = collection
+                self._add_collection(oapif_class(model))
             return oapif_class
 
         return wrapper
 
+    def _add_collection(self, collection: OapifCollection) -> None:
+        collection.warm_up()
+        connect_version_updates(collection.model)
+        if collection.geometry_field and collection.extent_strategy == "cached":
+            connect_cached_extent_updates(collection.model, collection.geometry_field, collection.extent_cache_timeout)
+        self.collections[collection.id] = collection
+
     @property
     def urls(self) -> tuple[list[URLResolver | URLPattern], str, str]:
         return self.api.urls
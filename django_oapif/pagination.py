@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+import operator
+from collections.abc import Sequence
+from functools import reduce
+from typing import Any
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Field, Model, Q
+from ninja.errors import HttpError
+
+
+def encode_cursor(key: Sequence[Any], offset: int) -> str:
+    """Encode the key of the last row of a page, and the offset of the next one, into an opaque token."""
+    # str() keeps full precision (eg: microseconds) of values JSON can't represent, Django parses them back
+    payload = json.dumps([offset, *key], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, model: type[Model], ordering: Sequence[str]) -> tuple[list[Any], int]:
+    """Decode a token created by `encode_cursor` into the key of the last row of the previous page and an offset.
+
+    Key values are converted to the Python values of the `ordering` fields, so forged or stale tokens are rejected
+    with a 400 rather than failing in the query.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise HttpError(400, "Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != len(ordering) + 1:
+        raise HttpError(400, "Invalid cursor")
+    offset, *key = payload
+    # `bool` is a subclass of `int`
+    if type(offset) is not int or offset < 0:
+        raise HttpError(400, "Invalid cursor")
+    for index, (name, value) in enumerate(zip(ordering, key)):
+        if value is None or (field := get_field(model, name.removeprefix("-"))) is None:
+            continue
+        if isinstance(value, (dict, list)):
+            raise HttpError(400, "Invalid cursor")
+        try:
+            key[index] = field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise HttpError(400, "Invalid cursor")
+    return key, offset
+
+
+def get_field(model: type[Model], name: str) -> Field | None:
+    try:
+        return model._meta.pk if name == "pk" else model._meta.get_field(name)  # type: ignore
+    except FieldDoesNotExist:
+        return None
+
+
+def is_nullable(model: type[Model], name: str) -> bool:
+    field = get_field(model, name)
+    return field is None or bool(getattr(field, "null", True))
+
+
+def keyset_filter(model: type[Model], ordering: Sequence[str], key: Sequence[Any]) -> Q:
+    """Return the filter selecting the rows sorted after `key` by `ordering`.
+
+    `ordering` must end with a unique field. NULLs are sorted as PostgreSQL does by default: last in ascending
+    order and first in descending order.
+    """
+    conditions = []
+    equal = Q()
+    for name, value in zip(ordering, key, strict=True):
+        field = name.removeprefix("-")
+        descending = name.startswith("-")
+        if value is None:
+            if descending:
+                conditions.append(equal & Q(**{f"{field}__isnull": False}))
+            equal &= Q(**{f"{field}__isnull": True})
+        else:
+            after = Q(**{f"{field}__lt" if descending else f"{field}__gt": value})
+            if not descending and is_nullable(model, field):
+                after |= Q(**{f"{field}__isnull": True})
+            conditions.append(equal & after)
+            equal &= Q(**{field: value})
+    return reduce(operator.or_, conditions)
@@ -0,0 +1,358 @@
+import csv
+import io
+import itertools
+import json
+import struct
+from collections.abc import Iterator, Sequence
+from typing import Any, Literal, NamedTuple
+
+from django.contrib.gis.db.models.functions import AsWKB, AsWKT
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Expression, F, Func, OrderBy, QuerySet, TextField, Value
+from django.db.models.functions import Cast
+
+# Django uses psycopg 3 when it is installed, whose cursors stream the output of COPY
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+FEATURES_SQL = """
+SELECT
+    COALESCE(
+        json_agg(
+            json_build_object(
+                'type', 'Feature',
+                'id', page.{id}::text,
+                'geometry', {geometry},
+                'properties', to_json(properties)
+            )
+            ORDER BY page._oapif_row
+        ) FILTER (WHERE page._oapif_row <= {limit}),
+        '[]'::json
+    )::text,
+    {bbox},
+    count(*),
+    {number_matched}{last_key}
+FROM (SELECT *, row_number() OVER ({ordering}) AS _oapif_row FROM ({page}) AS page({columns})) AS page
+CROSS JOIN LATERAL (SELECT {properties}) AS properties
+"""
+
+BBOX_SQL = "ST_XMin({extent}), ST_YMin({extent}), ST_XMax({extent}), ST_YMax({extent})"
+
+FLATGEOBUF_SQL = """
+SELECT ST_AsFlatGeobuf(fgb, {index}, '_oapif_fgb_geometry'), count(*)
+FROM (SELECT {properties} FROM ({page}) AS page({columns})) AS fgb
+"""
+
+# PostgreSQL types encoded natively by ST_AsFlatGeobuf, other columns are cast to text
+FLATGEOBUF_TYPES = {
+    "boolean",
+    "smallint",
+    "integer",
+    "bigint",
+    "real",
+    "double precision",
+    "numeric",
+    "varchar",
+    "text",
+    "jsonb",
+    "bytea",
+    "date",
+    "time",
+    "timestamp",
+    "timestamp with time zone",
+}
+
+# FlatGeobuf header `GeometryType` values, by `GeometryField.geom_type`
+FLATGEOBUF_GEOMETRY_TYPES = {
+    "POINT": 1,
+    "LINESTRING": 2,
+    "POLYGON": 3,
+    "MULTIPOINT": 4,
+    "MULTILINESTRING": 5,
+    "MULTIPOLYGON": 6,
+    "GEOMETRYCOLLECTION": 7,
+}
+FLATGEOBUF_MAGIC = b"fgb\x03fgb\x00"
+
+CSV_SQL = "COPY ({page}) TO STDOUT WITH (FORMAT csv, HEADER)"
+
+PAGE_SQL = """
+SELECT {columns}, {bbox}
+FROM (SELECT *, row_number() OVER ({ordering}) AS _oapif_row FROM ({page}) AS page({page_columns})) AS page
+WINDOW page_so_far AS (ORDER BY page._oapif_row)
+ORDER BY page._oapif_row
+"""
+
+
+def feature_json(id: Any, geometry: str | None, properties: str) -> str:
+    """Assemble a GeoJSON Feature from its already encoded geometry and properties."""
+    return f'{{"type":"Feature","id":{json.dumps(str(id))},"geometry":{geometry or "null"},"properties":{properties}}}'
+
+
+def values_column_names(qs: QuerySet) -> list[str]:
+    """Return the column names of a `values()` queryset, in the order they are selected in SQL."""
+    query = qs.query
+    if selected := getattr(query, "selected", None):
+        return list(selected)
+    return [*query.extra_select, *query.values_select, *query.annotation_select]
+
+
+def get_ordering(qs: QuerySet) -> list[OrderBy]:
+    """Return the ordering of `qs` as `OrderBy` expressions, random orderings being ignored."""
+    query = qs.query
+    ordering = query.order_by or (query.get_meta().ordering if query.default_ordering else ())
+    terms = []
+    for term in ordering:
+        if term == "?":
+            continue
+        if isinstance(term, str):
+            term = OrderBy(F(term.removeprefix("-")), descending=term.startswith("-"))
+        elif not isinstance(term, OrderBy):
+            term = term.asc()
+        terms.append(term)
+    return terms
+
+
+def get_order_by_sql(ordering: Sequence[OrderBy], columns: Sequence[str], tiebreaker: str) -> str:
+    """Return the `ORDER BY` clause sorting rows by `ordering`, whose expressions are selected as `columns`."""
+    order_by = [
+        f"{column} {'DESC' if term.descending else 'ASC'}"
+        + (" NULLS FIRST" if term.nulls_first else " NULLS LAST" if term.nulls_last else "")
+        for term, column in zip(ordering, columns, strict=True)
+    ]
+    return f"ORDER BY {', '.join([*order_by, tiebreaker])}"
+
+
+def iterate_with_extent(
+    qs: QuerySet, columns: Sequence[str | Expression], geometry: str, *, chunk_size: int | None = None
+) -> Iterator[tuple]:
+    """Yield the `values_list()` rows of `columns`, each followed by the extent of the geometries up to it.
+
+    The extent of a page is thus read from its last row, without another query. `geometry` is the name of an
+    annotation or alias holding the geometries, in the output CRS. With `chunk_size`, rows are fetched from a
+    server-side cursor in batches of that size.
+    """
+    connection = connections[qs.db]
+    ordering = get_ordering(qs)
+    values_qs = qs.values_list(*columns, *(term.expression for term in ordering), F("pk"), F(geometry))
+    compiler = values_qs.query.get_compiler(qs.db)
+    page_sql, page_params = compiler.as_sql()
+    # Page columns are renamed after their position in SQL, which may not follow the order of `values_list()`
+    selected = values_column_names(values_qs)
+    positions = [selected.index(name) for name in values_qs._fields]
+    page_columns = [f"page._oapif_{position}" for position in positions]
+    sql = PAGE_SQL.format(
+        columns=", ".join(page_columns[: len(columns)]),
+        bbox=BBOX_SQL.format(extent=f"ST_Extent({page_columns[-1]}) OVER page_so_far"),
+        ordering=get_order_by_sql(ordering, page_columns[len(columns) : -2], page_columns[-2]),
+        page=page_sql,
+        page_columns=", ".join(f"_oapif_{position}" for position in range(len(selected))),
+    )
+    converters = compiler.get_converters([compiler.select[position][0] for position in positions[: len(columns)]])
+    chunked = chunk_size is not None and not connection.settings_dict.get("DISABLE_SERVER_SIDE_CURSORS")
+    with connection.chunked_cursor() if chunked else connection.cursor() as cursor:
+        cursor.execute(sql, page_params)
+        batches = iter(lambda: cursor.fetchmany(chunk_size), []) if chunked else [cursor.fetchall()]
+        for rows in batches:
+            yield from map(tuple, compiler.apply_converters(rows, converters)) if converters else rows
+
+
+class DatabasePage(NamedTuple):
+    """A page of features rendered by `render_features_in_database`."""
+
+    # The GeoJSON array of the features
+    features: str
+    # The number of rows of the page query, which may select one more row than the page size
+    number_fetched: int
+    bbox: tuple[float, float, float, float] | None
+    # The values of the key columns of the last feature
+    last_key: tuple | None
+    number_matched: int | None
+
+
+def render_features_in_database(
+    qs: QuerySet,
+    properties: Sequence[str],
+    geometry: tuple[str, str] | None,
+    *,
+    limit: int,
+    key: Sequence[str] = (),
+    number_matched: str | None = None,
+) -> DatabasePage:
+    """Render a page of features as a GeoJSON array with a single PostgreSQL query, along with its metadata.
+
+    `qs` may select one more row than `limit`, telling whether a next page exists. Features are aggregated
+    in the order of `qs`, and the values of the `key` fields (eg: "-field_int") of the last one are returned.
+    `geometry` is a pair of annotation or alias names, holding the GeoJSON geometry (as produced by `AsGeoJSON`)
+    and the geometry itself, used to compute the page extent. `number_matched` is the name of an annotation
+    counting the matching rows, if any. Property values are rendered by PostgreSQL's JSON functions and never
+    loaded into Python.
+    """
+    connection = connections[qs.db]
+    qn = connection.ops.quote_name
+
+    ordering = get_ordering(qs)
+    columns: dict[str, Any] = {f"_oapif_order_{index}": term.expression for index, term in enumerate(ordering)}
+    columns |= {f"_oapif_key_{index}": F(name.removeprefix("-")) for index, name in enumerate(key)}
+    if number_matched:
+        columns["_oapif_number_matched"] = F(number_matched)
+    if geometry:
+        geojson, extent_geometry = geometry
+        values_qs = qs.values("pk", *properties, geojson, _oapif_extent=F(extent_geometry), **columns)
+        geometry_sql = f"page.{qn(geojson)}::json"
+        # The row past the page doesn't count in its extent
+        bbox_sql = BBOX_SQL.format(
+            extent=f"ST_Extent(CASE WHEN page._oapif_row <= {limit:d} THEN page._oapif_extent END)"
+        )
+    else:
+        values_qs = qs.values("pk", *properties, **columns)
+        geometry_sql = "NULL::json"
+        bbox_sql = "NULL, NULL, NULL, NULL"
+    page_sql, page_params = values_qs.query.get_compiler(qs.db).as_sql()
+
+    # Rows are numbered following the ordering of the page, which the aggregation doesn't preserve otherwise
+    order_columns = [f"page._oapif_order_{index}" for index in range(len(ordering))]
+    last_key = [
+        f"(array_agg(page._oapif_key_{index} ORDER BY page._oapif_row DESC)"
+        f" FILTER (WHERE page._oapif_row <= {limit:d}))[1]"
+        for index in range(len(key))
+    ]
+    sql = FEATURES_SQL.format(
+        id=qn("pk"),
+        geometry=geometry_sql,
+        limit=limit,
+        bbox=bbox_sql,
+        number_matched="max(page._oapif_number_matched)" if number_matched else "NULL",
+        last_key="".join(f",\n    {column}" for column in last_key),
+        ordering=get_order_by_sql(ordering, order_columns, f"page.{qn('pk')}"),
+        page=page_sql,
+        columns=", ".join(qn(column) for column in values_column_names(values_qs)),
+        properties=", ".join(f"page.{qn(name)}" for name in properties),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, page_params)
+        row = cursor.fetchone()
+    features, xmin, ymin, xmax, ymax, number_fetched, page_number_matched, *key_values = row
+    return DatabasePage(
+        features,
+        number_fetched,
+        None if xmin is None else (xmin, ymin, xmax, ymax),
+        tuple(key_values) if number_fetched else None,
+        page_number_matched,
+    )
+
+
+def render_flatgeobuf_in_database(
+    qs: QuerySet, properties: Sequence[str], geometry: str, *, index: bool, limit: int | None = None
+) -> tuple[bytes, int]:
+    """Render features as a FlatGeobuf file with `ST_AsFlatGeobuf`, optionally with a packed Hilbert R-tree index.
+
+    `geometry` is the name of an annotation or alias holding the geometries, in the output CRS. At most `limit`
+    features are rendered. Return the file and its number of features, the file being empty without features
+    (see `empty_flatgeobuf`).
+    """
+    connection = connections[qs.db]
+    qn = connection.ops.quote_name
+
+    values_qs = qs.values(*properties, _oapif_fgb_geometry=F(geometry))
+    if limit is not None:
+        values_qs = values_qs[:limit]
+    page_sql, page_params = values_qs.query.get_compiler(qs.db).as_sql()
+    columns = []
+    for name in properties:
+        try:
+            db_type = qs.model._meta.get_field(name).db_type(connection) or ""
+        except FieldDoesNotExist:
+            db_type = ""
+        cast = "" if db_type.partition("(")[0] in FLATGEOBUF_TYPES else "::text"
+        columns.append(f"page.{qn(name)}{cast} AS {qn(name)}")
+
+    sql = FLATGEOBUF_SQL.format(
+        index="true" if index else "false",
+        properties=", ".join([*columns, "page._oapif_fgb_geometry"]),
+        page=page_sql,
+        columns=", ".join(qn(column) for column in values_column_names(values_qs)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, page_params)
+        content, number_rendered = cursor.fetchone()
+    return (bytes(content) if content else b""), number_rendered
+
+
+def empty_flatgeobuf(geom_type: str, srid: int) -> bytes:
+    """Return a FlatGeobuf file without features, as `ST_AsFlatGeobuf` returns an empty value for no rows.
+
+    The header only holds the geometry type, the EPSG code of the CRS and no spatial index, encoded as the
+    flatbuffer `Header { geometry_type, index_node_size: 0, crs: Crs { code } }`.
+    """
+    header = struct.pack(
+        "<I"  # Offset of the header table
+        "13H2x"  # Header vtable: its size, the table size, then offsets of fields 0 to 10
+        "iIHBx"  # Header table: offset back to its vtable, crs, index_node_size, geometry_type
+        "4H"  # Crs vtable: its size, the table size, then offsets of fields 0 (org) and 1 (code)
+        "ii",  # Crs table: offset back to its vtable, code
+        32,
+        *(26, 12, 0, 0, 10, 0, 0, 0, 0, 0, 0, 8, 4),
+        *(28, 16, 0, FLATGEOBUF_GEOMETRY_TYPES.get(geom_type, 0)),
+        *(8, 8, 0, 4),
+        *(8, srid),
+    )
+    return FLATGEOBUF_MAGIC + struct.pack("<I", len(header)) + header
+
+
+def render_csv(
+    qs: QuerySet,
+    properties: Sequence[str],
+    geometry: tuple[str, str] | None,
+    *,
+    geometry_format: Literal["wkt", "wkb"],
+    chunk_size: int,
+) -> Iterator[bytes]:
+    """Render features as CSV with a header row, yielded in chunks, without instantiating models.
+
+    `geometry` is a pair of the name of the geometry column and of an annotation or alias holding the geometries,
+    rendered as WKT or hex-encoded WKB. Values are rendered by PostgreSQL, streamed from `COPY ... TO STDOUT` with
+    psycopg 3, or else fetched as text from a server-side cursor in batches of `chunk_size` rows.
+    """
+    columns: dict[str, Any] = {}
+    for name in properties:
+        columns[name] = Cast(F(name), TextField())
+    if geometry:
+        geometry_column, geometry_alias = geometry
+        if geometry_format == "wkt":
+            columns[geometry_column] = AsWKT(F(geometry_alias))
+        else:
+            columns[geometry_column] = Func(
+                AsWKB(F(geometry_alias)), Value("hex"), function="encode", output_field=TextField()
+            )
+
+    if psycopg is not None:
+        connection = connections[qs.db]
+        qn = connection.ops.quote_name
+        values_qs = qs.values(**{f"_oapif_csv_{index}": value for index, value in enumerate(columns.values())})
+        page_sql, page_params = values_qs.query.get_compiler(qs.db).as_sql()
+        # The header row holds the column names of the outer query, as the page subquery selects aliases
+        select_sql = "SELECT {columns} FROM ({page}) AS page".format(
+            columns=", ".join(
+                f"page.{qn(alias)} AS {qn(name)}" for alias, name in zip(values_column_names(values_qs), columns)
+            ),
+            page=page_sql,
+        )
+        with connection.cursor() as cursor, cursor.cursor.copy(CSV_SQL.format(page=select_sql), page_params) as copy:
+            for data in copy:
+                yield bytes(data)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    rows = qs.values_list(*columns.values()).iterator(chunk_size=chunk_size)
+    for batch in itertools.batched(rows, chunk_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
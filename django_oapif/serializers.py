@@ -0,0 +1,110 @@
+import json
+from collections.abc import Callable
+from datetime import date, datetime, time, timedelta
+from typing import Any
+
+from django.db.models import (
+    DateField,
+    DateTimeField,
+    DecimalField,
+    DurationField,
+    Expression,
+    Field,
+    FileField,
+    ForeignKey,
+    GeneratedField,
+    Model,
+    QuerySet,
+    TimeField,
+    UUIDField,
+)
+from django.utils.duration import duration_iso_string
+
+from django_oapif.rendering import feature_json
+
+type Encoder = Callable[[Any], Any]
+
+dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def encode_datetime(value: datetime) -> str:
+    iso = value.isoformat()
+    return iso[:-6] + "Z" if iso.endswith("+00:00") else iso
+
+
+def encode_isoformat(value: date | time) -> str:
+    return value.isoformat()
+
+
+def encode_duration(value: timedelta) -> str:
+    return duration_iso_string(value)
+
+
+def get_file_encoder(field: FileField) -> Encoder:
+    storage = field.storage
+
+    def encode_file(value: Any) -> str | None:
+        # `value` is the stored name when coming from `values_list()`, or a FieldFile on model instances
+        return storage.url(str(value)) if value else None
+
+    return encode_file
+
+
+def get_encoder(field: Field) -> Encoder | None:
+    """Return the function converting a database value of `field` to a JSON serializable value, if any is needed."""
+    if isinstance(field, ForeignKey):
+        return get_encoder(field.target_field)
+    if isinstance(field, GeneratedField):
+        return get_encoder(field.output_field)
+    if isinstance(field, FileField):
+        return get_file_encoder(field)
+    if isinstance(field, (UUIDField, DecimalField)):
+        return str
+    if isinstance(field, DateTimeField):
+        return encode_datetime
+    if isinstance(field, (DateField, TimeField)):
+        return encode_isoformat
+    if isinstance(field, DurationField):
+        return encode_duration
+    return None
+
+
+class FeatureSerializer:
+    """Renders database rows to GeoJSON features, without instantiating models nor validating values.
+
+    Rows are `values_list()` tuples of `columns`: the primary key, the GeoJSON geometry annotation if any,
+    then the property fields in order. Any trailing column is ignored.
+    """
+
+    def __init__(self, model: type[Model], fields: tuple[str, ...], geometry: str | None) -> None:
+        self.fields = fields
+        self.geometry = geometry
+        self.columns = ("pk", *([geometry] if geometry else []), *fields)
+        self.properties_start = len(self.columns) - len(fields)
+        self.model_fields = [model._meta.get_field(name) for name in fields]
+        self.encoders = [
+            (index, encoder)
+            for index, field in enumerate(self.model_fields)
+            if (encoder := get_encoder(field)) is not None  # type: ignore
+        ]
+
+    def values(self, qs: QuerySet, *extra: str | Expression) -> QuerySet:
+        """Return `qs` as `values_list()` rows this serializer can render, followed by `extra` columns."""
+        return qs.values_list(*self.columns, *extra)
+
+    def serialize(self, row: tuple) -> str:
+        values = list(row[self.properties_start : self.properties_start + len(self.fields)])
+        for index, encode in self.encoders:
+            if values[index] is not None:
+                values[index] = encode(values[index])
+        geometry = row[1] if self.geometry else None
+        return feature_json(row[0], geometry, dumps(dict(zip(self.fields, values, strict=True))))
+
+    def serialize_instance(self, obj: Model) -> str:
+        """Render a model instance, as returned by `OapifCollection.query`."""
+        row = (
+            obj.pk,
+            *([getattr(obj, self.geometry, None)] if self.geometry else []),
+            *(field.value_from_object(obj) for field in self.model_fields),
+        )
+        return self.serialize(row)
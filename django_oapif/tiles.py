@@ -0,0 +1,76 @@
+from collections.abc import Sequence
+
+from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import Polygon as GEOSPolygon
+from django.db import connections
+from django.db.models import QuerySet
+
+from django_oapif.functions import AsMVTGeom
+from django_oapif.rendering import values_column_names
+
+WEB_MERCATOR_SRID = 3857
+# Half the width of the WebMercatorQuad tile matrix set, in metres
+WEB_MERCATOR_BOUND = 20037508.342789244
+MAX_ZOOM = 24
+# Resolution of the tile grid, and margin around tiles (in tile grid units) keeping features rendered across edges
+TILE_EXTENT = 4096
+TILE_BUFFER = 256
+
+TILE_SQL = """
+SELECT ST_AsMVT(tile, %s, {extent}, '_oapif_mvt_geometry'{feature_id})
+FROM ({page}) AS tile({columns})
+WHERE tile._oapif_mvt_geometry IS NOT NULL
+"""
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    """Return whether `z/x/y` addresses a tile of the WebMercatorQuad tile matrix set, up to `MAX_ZOOM`."""
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_bounds(z: int, x: int, y: int, margin: float = 0) -> GEOSPolygon:
+    """Return the bounds of a WebMercatorQuad tile, grown by `margin` tile grid units on each side."""
+    size = 2 * WEB_MERCATOR_BOUND / 2**z
+    margin = size * margin / TILE_EXTENT
+    xmin = -WEB_MERCATOR_BOUND + x * size
+    ymax = WEB_MERCATOR_BOUND - y * size
+    bounds = GEOSPolygon.from_bbox((xmin - margin, ymax - size - margin, xmin + size + margin, ymax + margin))
+    bounds.srid = WEB_MERCATOR_SRID
+    return bounds
+
+
+def render_tile(
+    qs: QuerySet,
+    properties: Sequence[str],
+    geometry_field: str,
+    z: int,
+    x: int,
+    y: int,
+    *,
+    layer: str,
+    feature_id: bool = False,
+) -> bytes:
+    """Render the features of `qs` intersecting a WebMercatorQuad tile as a Mapbox Vector Tile.
+
+    Only the `properties` fields are encoded as feature attributes. With `feature_id`, the (integer) primary key is
+    used as feature id.
+    """
+    connection = connections[qs.db]
+    qn = connection.ops.quote_name
+
+    # The bounding box filter uses the spatial index of the geometry field
+    qs = qs.filter(**{f"{geometry_field}__bboverlaps": tile_bounds(z, x, y, margin=TILE_BUFFER)})
+    geometry = AsMVTGeom(Transform(geometry_field, WEB_MERCATOR_SRID), tile_bounds(z, x, y), TILE_EXTENT, TILE_BUFFER)
+    values_qs = qs.values(*(["pk"] if feature_id else []), *properties, _oapif_mvt_geometry=geometry)
+    page_sql, page_params = values_qs.query.get_compiler(qs.db).as_sql()
+
+    sql = TILE_SQL.format(
+        extent=TILE_EXTENT,
+        feature_id=", 'pk'" if feature_id else "",
+        page=page_sql,
+        columns=", ".join(qn(column) for column in values_column_names(values_qs)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (layer, *page_params))
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile else b""
@@ -1,28 +1,69 @@
 import copy
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
 from typing import Any
 from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
 
-from django.http import HttpRequest
 from ninja import Schema
 from pydantic import create_model
 from pydantic.fields import FieldInfo
 from pydantic_core import PydanticUndefined
 
 
-def replace_query_param(request: HttpRequest, **kwargs: Any) -> str:
-    url = request.build_absolute_uri()
+def replace_query_param(url: str, **kwargs: Any) -> str:
     parsed = urlparse(url)
     query = parse_qs(parsed.query)
     # Update or remove parameters
     for k, v in kwargs.items():
         if v is None:
-            query.pop(k)
+            query.pop(k, None)
         else:
             query[k] = [str(v)]
     new_query = urlencode(query, doseq=True)
     return urlunparse(parsed._replace(query=new_query))
 
 
+def parse_accept(header: str) -> dict[str, float]:
+    """Parse an `Accept` or `Accept-Encoding` header into a mapping of media types or codings to their quality."""
+    accepted = {}
+    for item in header.split(","):
+        value, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, param_value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        if value:
+            accepted[value.strip().lower()] = quality
+    return accepted
+
+
+def parse_byte_range(header: str, length: int) -> tuple[int, int] | None:
+    """Parse a `Range` header holding a single byte range into the first and last (inclusive) byte positions.
+
+    Return None for headers that must be ignored, eg: other units or multiple ranges. The range is
+    unsatisfiable when the first position is past `length`.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if not first:
+            # A suffix range, eg: `bytes=-500` for the last 500 bytes
+            suffix = int(last)
+            return (max(length - suffix, 0), length - 1) if suffix > 0 else (length, length)
+        start = int(first)
+        end = min(int(last), length - 1) if last else length - 1
+    except ValueError:
+        return None
+    return (start, end) if start >= length or 0 <= start <= end else None
+
+
 class PatchSchema[T: Schema](Schema):
     """Make all fields in a schema optional by setting their default to None"""
 
@@ -39,3 +80,36 @@ class PatchSchema[T: Schema](Schema):
             __module__=model.__module__,
             **{field_name: make_field_optional(field_info) for field_name, field_info in model.model_fields.items()},  # type: ignore
         )  # type: ignore
+
+
+class LRUCache[K: Hashable, V]:
+    """Thread-safe mapping holding at most `maxsize` entries, evicting the least recently used first."""
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_or_set(self, key: K, factory: Callable[[], V]) -> V:
+        """Return the value cached under `key`, calling `factory` to create it on a miss."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = factory()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,50 @@
+import time
+import uuid
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+
+CACHE_PREFIX = "django_oapif.version"
+
+
+class Version(NamedTuple):
+    token: str
+    # Unix timestamp of the change, in seconds
+    last_modified: int
+
+
+def get_version_key(model: type[Model]) -> str:
+    return f"{CACHE_PREFIX}:{model._meta.label_lower}"
+
+
+def new_version() -> tuple[str, int]:
+    return uuid.uuid4().hex, int(time.time())
+
+
+def get_version(model: type[Model]) -> Version:
+    """Return the current version of the data of `model`, stored in Django's cache framework.
+
+    A version is created on first use, or when the cache evicted it: readers then only see a change.
+    """
+    return Version(*cache.get_or_set(get_version_key(model), new_version, None))
+
+
+def bump_version(model: type[Model]) -> None:
+    cache.set(get_version_key(model), new_version(), None)
+
+
+def bump_version_receiver(sender: type[Model], **kwargs) -> None:
+    """Signal receiver bumping the version of `sender`."""
+    bump_version(sender)
+
+
+def connect_version_updates(model: type[Model]) -> None:
+    """Bump the version of `model` whenever one of its instances is saved or deleted.
+
+    Writes that bypass model signals, eg: `QuerySet.update()` or `bulk_create()`, must call `bump_version`.
+    """
+    dispatch_uid = get_version_key(model)
+    post_save.connect(bump_version_receiver, sender=model, dispatch_uid=dispatch_uid)
+    post_delete.connect(bump_version_receiver, sender=model, dispatch_uid=dispatch_uid)
@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django_oapif.crs import CRS, CRS84_SRID
+from django_oapif_tests.tests.oapif import oapif
+
+
+class Command(BaseCommand):
+    help = "Compare the size and rendering time of item pages at several coordinate precisions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-c", "--collection", default="tests.line_2056_10fields")
+        parser.add_argument("-s", "--srid", type=int, default=CRS84_SRID, help="SRID of the output CRS")
+        parser.add_argument("-l", "--limit", type=int, default=1000)
+        parser.add_argument("-r", "--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        collection = oapif.collections[options["collection"]]
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        crs = CRS("OGC" if options["srid"] == CRS84_SRID else "EPSG", options["srid"])
+        default = collection.get_coordinate_precision(request, crs)
+
+        # 8 digits is the AsGeoJSON default, used before precision was derived from the CRS
+        for precision in sorted({default, 8, 15}):
+            qs = collection.query(request, crs, precision=precision)[: options["limit"]]
+            best = float("inf")
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                content = "".join(collection.render_featurecollection(request, qs.all(), lambda page: {}))
+                best = min(best, time.perf_counter() - start)
+            label = f"{precision} digits{' (default)' if precision == default else ''}"
+            self.stdout.write(f"{label}: {len(content.encode()):,} bytes in {best:.4f}s")
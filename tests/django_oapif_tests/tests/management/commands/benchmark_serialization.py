@@ -0,0 +1,38 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django_oapif.crs import CRS, CRS84_SRID
+from django_oapif_tests.tests.oapif import oapif
+
+
+class Command(BaseCommand):
+    help = "Compare the features/sec of the validated (pydantic) and compiled feature serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-c", "--collection", default="tests.nogeom_100fields")
+        parser.add_argument("-l", "--limit", type=int, default=1000)
+        parser.add_argument("-r", "--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        collection = oapif.collections[options["collection"]]
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        qs = collection.query(request, CRS("OGC", CRS84_SRID))[: options["limit"]]
+
+        def validated():
+            # Model instantiation and pydantic validation, as done before the compiled serializer
+            return [collection.model_to_feature(request, obj).model_dump_json() for obj in qs.all()]
+
+        def compiled():
+            serializer = collection.get_feature_serializer(request)
+            return [serializer.serialize(row) for row in serializer.values(qs.all())]
+
+        for name, serialize in (("validated", validated), ("compiled", compiled)):
+            best = float("inf")
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                count = len(serialize())
+                best = min(best, time.perf_counter() - start)
+            self.stdout.write(f"{name}: {count} features in {best:.4f}s ({count / best:,.0f} features/sec)")
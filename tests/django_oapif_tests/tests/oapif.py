@@ -1,5 +1,6 @@
 from django_oapif import OAPIF
 from django_oapif.auth import BasicAuth, DjangoAuth
+from django_oapif.cache import ResponseCache
 from django_oapif.handler import AnonReadOnlyCollection, OapifCollection
 
 from .models import (
@@ -35,3 +36,124 @@ oapif.register_collection(LayerWithFile, AnonReadOnlyCollection)
 class Point_2056_10fieldsSubsetCollection(AnonReadOnlyCollection):
     id = "tests.point_2056_10fields_subset"
     fields = ("field_int", "field_str_0")
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsDatabaseRenderedCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_db"
+    ordering = ("field_str_0",)
+    render_in_database = True
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsDatabaseRenderedKeysetCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_db_keyset"
+    ordering = ("-field_int",)
+    pagination = "keyset"
+    count_strategy = "window"
+    render_in_database = True
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsStreamedCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_streamed"
+    ordering = ("field_str_0",)
+    stream_items = True
+    stream_chunk_size = 3
+    compress_responses = True
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsCompressedCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_compressed"
+    compress_responses = True
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsKeysetCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_keyset"
+    ordering = ("-field_int",)
+    pagination = "keyset"
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsUncountedCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_uncounted"
+    count_strategy = "none"
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsEstimatedCountCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_estimated"
+    count_strategy = "estimated"
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsCachedCountCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_cached"
+    count_strategy = "cached"
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsWindowCountCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_window"
+    ordering = ("field_int",)
+    pagination = "keyset"
+    count_strategy = "window"
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsConditionalCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_conditional"
+    conditional_get = True
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsCachedResponsesCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_cached_responses"
+    response_cache = ResponseCache()
+    compress_responses = True
+
+
+@oapif.register(Line_2056_10fields)
+class Line_2056_10fieldsCappedSimplificationCollection(AnonReadOnlyCollection):
+    id = "tests.line_2056_10fields_capped"
+    max_simplification = 2
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsTilesCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_tiles"
+    tile_fields = {8: ("field_str_0",), 14: ("field_str_0", "field_int")}
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsFlatGeobufCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_fgb"
+    output_formats = ("fgb", "json")
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsCappedFlatGeobufCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_fgb_capped"
+    flatgeobuf_max_features = 2
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsWKBCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_wkb"
+    fields = ("field_int", "field_str_0")
+    csv_geometry = "wkb"
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsIndexedFiltersCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_indexed_filters"
+    unindexed_filters = "reject"
+
+
+@oapif.register(Point_2056_10fields)
+class Point_2056_10fieldsThrottledFiltersCollection(AnonReadOnlyCollection):
+    id = "tests.point_2056_10fields_throttled_filters"
+    unindexed_filters = "throttle"
+    unindexed_filter_rate = 1
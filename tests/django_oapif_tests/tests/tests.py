@@ -1,10 +1,31 @@
+import csv
+import gzip
+import io
+import json
 import logging
+import math
 import re
+import tempfile
+import uuid
+from unittest import skipUnless
 
 from django.contrib.auth.models import User
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
 from django.core.management import call_command
-from django.test.testcases import TestCase
-from django_oapif_tests.tests.models import LayerWithFile, Point_2056_10fields
+from django.db.models import Q
+from django.test import RequestFactory
+from django.test.testcases import SimpleTestCase, TestCase
+from django_oapif.compression import COMPRESSORS, negotiate_encoding
+from django_oapif.cql2 import parse_filter
+from django_oapif.crs import get_default_precision
+from django_oapif.encoders import Encoder
+from django_oapif.export import is_export_available
+from django_oapif.handler import output_schemas
+from django_oapif.pagination import encode_cursor
+from django_oapif.serializers import FeatureSerializer
+from django_oapif_tests.tests.models import LayerWithFile, Line_2056_10fields, NoGeom_100fields, Point_2056_10fields
+from django_oapif_tests.tests.oapif import oapif
 
 logger = logging.getLogger(__name__)
 
@@ -147,6 +168,31 @@ class TestBasicAuth(TestCase):
         }
         self.assertEqual(post_to_items.json(), expected_error)
 
+    def test_get_item_geometry(self):
+        point = Point_2056_10fields.objects.first()
+        assert point is not None
+        url = f"{collections_url}/tests.point_2056_10fields/items/{point.pk}"
+        response = self.client.get(url, {"crs": "http://www.opengis.net/def/crs/EPSG/0/2056"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/geo+json")
+        self.assertEqual(response.json()["geometry"], {"type": "Point", "coordinates": list(point.geom.coords)})
+
+    def test_items_bbox(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        response = self.client.get(url, {"limit": 10, "crs": "http://www.opengis.net/def/crs/EPSG/0/2056"}).json()
+        geometries = [feature["geometry"] for feature in response["features"]]
+        self.assertTrue(all("bbox" not in geometry for geometry in geometries))
+        xs = [geometry["coordinates"][0] for geometry in geometries]
+        ys = [geometry["coordinates"][1] for geometry in geometries]
+        self.assertEqual(response["bbox"], [min(xs), min(ys), max(xs), max(ys)])
+
+    def test_file_field_items(self):
+        obj = LayerWithFile.objects.create(file="foo/bar.txt")
+        response = self.client.get(f"{collections_url}/tests.layerwithfile/items")
+        self.assertEqual(response.status_code, 200)
+        features = {feature["id"]: feature for feature in response.json()["features"]}
+        self.assertEqual(features[str(obj.id)]["properties"], {"file": "/media/foo/bar.txt", "id": str(obj.id)})
+
     def test_file_field(self):
         obj = LayerWithFile.objects.create(file="foo/bar.txt")
         obj.refresh_from_db()
@@ -289,3 +335,875 @@ class TestSchema(TestCase):
             schema_response.json()["properties"]["geom"],
             {"title": "geometry", "x-ogc-role": "primary-geometry", "format": "geometry-any"},
         )
+
+
+class TestOutputSchemaCache(SimpleTestCase):
+    def test_output_schema_prewarmed(self):
+        collection = oapif.collections["tests.point_2056_10fields_subset"]
+        self.assertIn((collection.id, collection.fields, collection.exclude, True), output_schemas)
+
+    def test_output_schema_reused(self):
+        collection = oapif.collections["tests.point_2056_10fields"]
+        request = RequestFactory().get("/")
+        FeatureSchema = collection.get_feature_output_schema(request)
+        self.assertIs(collection.get_feature_output_schema(request), FeatureSchema)
+        self.assertEqual(
+            collection.get_featurecollection_output_schema(request).model_fields["features"].annotation,
+            list[FeatureSchema],
+        )
+
+    def test_selected_properties_serializer(self):
+        collection = oapif.collections["tests.point_2056_10fields"]
+        request = RequestFactory().get("/")
+        serializer = collection.get_feature_serializer(request, ("field_str_0", "field_int"))
+        self.assertEqual(serializer.fields, ("field_str_0", "field_int"))
+        self.assertIs(collection.get_feature_serializer(request, ("field_str_0", "field_int")), serializer)
+        # Selections don't build pydantic schemas
+        self.assertNotIn((collection.id, ("field_str_0", "field_int"), (), True), output_schemas)
+
+    def test_output_schema_per_field_set(self):
+        collection = oapif.collections["tests.point_2056_10fields"]
+        schemas = collection.get_output_schemas(("field_int", "field_str_0"), ())
+        self.assertIsNot(schemas.feature, collection.get_output_schemas(collection.fields, collection.exclude).feature)
+        self.assertEqual(
+            set(schemas.properties.model_fields),
+            {"field_int", "field_str_0"},
+        )
+
+
+class TestDatabaseRendering(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def test_items_match_python_rendering(self):
+        rendered = self.client.get(f"{collections_url}/tests.point_2056_10fields_db/items?limit=5&offset=5")
+        self.assertEqual(rendered.status_code, 200)
+        self.assertEqual(rendered.headers["Content-Type"], "application/geo+json")
+        rendered = rendered.json()
+
+        expected = self.client.get(f"{collections_url}/tests.point_2056_10fields/items?limit=100").json()
+        expected_features = {feature["id"]: feature for feature in expected["features"]}
+
+        self.assertEqual(rendered["numberMatched"], expected["numberMatched"])
+        self.assertEqual(rendered["numberReturned"], 5)
+        self.assertEqual({link["rel"] for link in rendered["links"]}, {"self", "prev", "next"})
+        for feature in rendered["features"]:
+            self.assertEqual(feature, expected_features[feature["id"]])
+        self.assertEqual(len(rendered["bbox"]), 4)
+
+    def test_features_in_order(self):
+        url = f"{collections_url}/tests.point_2056_10fields_db/items"
+        get_default_precision(4326)  # caches the CRS units, read from the database once
+        with self.assertNumQueries(2):  # the page, then its count
+            response = self.client.get(url, {"limit": 7, "offset": 3}).json()
+        expected = Point_2056_10fields.objects.order_by("field_str_0").values_list("pk", flat=True)[3:10]
+        self.assertEqual([feature["id"] for feature in response["features"]], [str(pk) for pk in expected])
+
+    def test_keyset_pages(self):
+        url = f"{collections_url}/tests.point_2056_10fields_keyset/items"
+        expected = [feature["id"] for feature in self.client.get(url, {"limit": 100}).json()["features"]]
+        get_default_precision(4326)
+        ids = []
+        next_url = f"{collections_url}/tests.point_2056_10fields_db_keyset/items?limit=6"
+        while next_url:
+            with self.assertNumQueries(1):  # the page with its total
+                response = self.client.get(next_url).json()
+            self.assertEqual(response["numberMatched"], len(expected))
+            ids += [feature["id"] for feature in response["features"]]
+            next_url = next((link["href"] for link in response["links"] if link["rel"] == "next"), None)
+        self.assertEqual(ids, expected)
+
+    def test_empty_page(self):
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields_db/items?offset=1000").json()
+        self.assertEqual(response["features"], [])
+        self.assertEqual(response["numberReturned"], 0)
+        self.assertIsNone(response["bbox"])
+
+
+class TestStreaming(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def test_items_match_buffered_response(self):
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields_streamed/items?limit=10&offset=5")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b"".join(response.streaming_content))
+
+        expected = self.client.get(f"{collections_url}/tests.point_2056_10fields_db/items?limit=10&offset=5").json()
+        self.assertEqual(streamed["numberMatched"], expected["numberMatched"])
+        self.assertEqual(streamed["numberReturned"], 10)
+        self.assertEqual(streamed["features"], expected["features"])
+        self.assertEqual([link["rel"] for link in streamed["links"]], [link["rel"] for link in expected["links"]])
+        self.assertEqual(streamed["bbox"], expected["bbox"])
+
+
+class TestFeatureSequences(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def test_geojson_text_sequence(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        expected = self.client.get(url, {"limit": 10, "offset": 5}).json()
+        response = self.client.get(url, {"limit": 10, "offset": 5, "f": "geojsonseq"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.headers["Content-Type"], "application/geo+json-seq")
+        content = b"".join(response.streaming_content).decode()
+        records = [json.loads(record) for record in content.split("\x1e")[1:]]
+        *features, trailer = records
+        self.assertEqual(features, expected["features"])
+        self.assertEqual(trailer["type"], "FeatureCollection")
+        self.assertEqual(trailer["features"], [])
+        self.assertEqual(trailer["numberReturned"], 10)
+        self.assertEqual(trailer["numberMatched"], expected["numberMatched"])
+        self.assertEqual(trailer["bbox"], expected["bbox"])
+        self.assertEqual({link["type"] for link in trailer["links"]}, {"application/geo+json-seq"})
+
+    def test_newline_delimited(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        response = self.client.get(url, {"limit": 3}, headers={"Accept": "application/x-ndjson"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual([json.loads(line)["type"] for line in lines], ["Feature"] * 3 + ["FeatureCollection"])
+
+
+class TestKeysetPagination(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def test_next_links_match_offset_pages(self):
+        url = f"{collections_url}/tests.point_2056_10fields_keyset/items"
+        # populate_data rounds the size up to a square grid
+        total = Point_2056_10fields.objects.count()
+        offset_ids = []
+        for offset in range(0, total, 6):
+            offset_ids += [
+                feature["id"] for feature in self.client.get(f"{url}?limit=6&offset={offset}").json()["features"]
+            ]
+
+        keyset_ids = []
+        next_url = f"{url}?limit=6"
+        while next_url:
+            response = self.client.get(next_url).json()
+            keyset_ids += [feature["id"] for feature in response["features"]]
+            self.assertEqual(response["numberMatched"], total)
+            next_url = next((link["href"] for link in response["links"] if link["rel"] == "next"), None)
+            if next_url:
+                self.assertIn("cursor=", next_url)
+                self.assertNotIn("offset=", next_url)
+        self.assertEqual(keyset_ids, offset_ids)
+        self.assertEqual(len(set(keyset_ids)), total)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields_keyset/items?cursor=notacursor")
+        self.assertEqual(response.status_code, 400)
+
+    def test_tampered_cursor(self):
+        url = f"{collections_url}/tests.point_2056_10fields_keyset/items"
+        pk = str(Point_2056_10fields.objects.values_list("pk", flat=True).first())
+        for key, offset in (
+            (["abc", pk], 5),
+            ([1, "not-a-uuid"], 5),
+            ([{"a": 1}, pk], 5),
+            ([1, pk], -1),
+            ([1, pk], True),
+        ):
+            response = self.client.get(url, {"cursor": encode_cursor(key, offset)})
+            self.assertEqual(response.status_code, 400, (key, offset))
+        self.assertEqual(self.client.get(url, {"cursor": encode_cursor(["1", pk], 5)}).status_code, 200)
+
+
+class TestCountStrategies(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+        cls.total = Point_2056_10fields.objects.count()
+
+    def get_rels(self, response: dict) -> list[str]:
+        return [link["rel"] for link in response["links"]]
+
+    def test_none_omits_number_matched(self):
+        url = f"{collections_url}/tests.point_2056_10fields_uncounted/items"
+        response = self.client.get(f"{url}?limit={self.total - 1}").json()
+        self.assertNotIn("numberMatched", response)
+        self.assertEqual(self.get_rels(response), ["self", "next"])
+
+        # The page is exactly the remaining items: the lookahead row tells there is no next page
+        response = self.client.get(f"{url}?limit=1&offset={self.total - 1}").json()
+        self.assertEqual(response["numberReturned"], 1)
+        self.assertEqual(self.get_rels(response), ["self", "prev"])
+
+    def test_estimated(self):
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields_estimated/items?limit=5").json()
+        self.assertIsInstance(response["numberMatched"], int)
+        self.assertEqual(response["numberReturned"], 5)
+        self.assertIn("next", self.get_rels(response))
+
+    def test_window(self):
+        url = f"{collections_url}/tests.point_2056_10fields_window/items"
+        get_default_precision(4326)  # caches the CRS units, read from the database once
+        with self.assertNumQueries(1):  # the page with its total and its bbox
+            response = self.client.get(f"{url}?limit=10").json()
+        self.assertEqual(response["numberMatched"], self.total)
+
+        # After a cursor, the total is the window count plus the offset of the page
+        next_url = next(link["href"] for link in response["links"] if link["rel"] == "next")
+        self.assertEqual(self.client.get(next_url).json()["numberMatched"], self.total)
+
+        # An empty page falls back to a plain count
+        response = self.client.get(f"{url}?offset={self.total}").json()
+        self.assertEqual(response["numberReturned"], 0)
+        self.assertEqual(response["numberMatched"], self.total)
+
+    def test_cached_invalidated_on_save(self):
+        cache.clear()
+        url = f"{collections_url}/tests.point_2056_10fields_cached/items?limit=1"
+        self.assertEqual(self.client.get(url).json()["numberMatched"], self.total)
+
+        Point_2056_10fields.objects.filter(pk=Point_2056_10fields.objects.last().pk).delete()
+        self.assertEqual(self.client.get(url).json()["numberMatched"], self.total - 1)
+
+        # Writes bypassing signals keep the cached count
+        Point_2056_10fields.objects.bulk_create([Point_2056_10fields(field_int=1)])
+        self.assertEqual(self.client.get(url).json()["numberMatched"], self.total - 1)
+
+        Point_2056_10fields.objects.create(field_int=2)
+        self.assertEqual(self.client.get(url).json()["numberMatched"], self.total + 1)
+
+
+class TestCollectionExtent(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_extent(self) -> list[float]:
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields").json()
+        return response["extent"]["spatial"]["bbox"][0]
+
+    def test_cached_extent(self):
+        self.assertEqual(self.get_extent(), [2508500, 1152000, 2508600, 1152100])
+        with self.assertNumQueries(0):
+            self.get_extent()
+
+        # Saving widens the cached extent without querying it
+        far = Point_2056_10fields.objects.create(geom="Point(2600000 1200000)")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_extent(), [2508500, 1152000, 2600000, 1200000])
+
+        # Deleting recomputes it
+        far.delete()
+        self.assertEqual(self.get_extent(), [2508500, 1152000, 2508600, 1152100])
+
+
+class TestConditionalGet(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_items_not_modified(self):
+        url = f"{collections_url}/tests.point_2056_10fields_conditional/items"
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, 304)
+
+        # Other query strings are other representations
+        response = self.client.get(f"{url}?limit=1", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        Point_2056_10fields.objects.create(geom="Point(2508500 1152000)")
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_item_not_modified(self):
+        item = Point_2056_10fields.objects.first()
+        url = f"{collections_url}/tests.point_2056_10fields_conditional/items/{item.pk}"
+        etag = self.client.get(url).headers["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+
+        item.field_int = 42
+        item.save()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["properties"]["field_int"], 42)
+
+
+class TestResponseCache(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_until_write(self):
+        response_cache = oapif.collections["tests.point_2056_10fields_cached_responses"].response_cache
+        stats = response_cache.stats()
+        url = f"{collections_url}/tests.point_2056_10fields_cached_responses/items"
+        expected = self.client.get(f"{url}?limit=2").json()
+
+        # Parameters are normalized, unknown ones are ignored
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f"{url}?limit=2&offset=0&foo=bar").json(), expected)
+        self.assertEqual(self.client.get(f"{url}?limit=3").json()["numberReturned"], 3)
+        self.assertEqual(response_cache.stats(), {"hits": stats["hits"] + 1, "misses": stats["misses"] + 2})
+
+        Point_2056_10fields.objects.create(geom="Point(2508500 1152000)")
+        self.assertEqual(self.client.get(f"{url}?limit=2").json()["numberMatched"], expected["numberMatched"] + 1)
+
+    def test_cached_links(self):
+        url = f"{collections_url}/tests.point_2056_10fields_cached_responses/items"
+        self.client.get(f"{url}?foo=bar&offset=0&limit=2&skipGeometry=false")
+
+        with self.assertNumQueries(0):
+            links = {link["rel"]: link["href"] for link in self.client.get(f"{url}?limit=2").json()["links"]}
+        self.assertEqual(links["self"], f"http://testserver{url}?f=json&limit=2")
+        self.assertEqual(links["next"], f"http://testserver{url}?f=json&limit=2&offset=2")
+
+
+class TestCompression(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_gzip_items(self):
+        url = f"{collections_url}/tests.point_2056_10fields_compressed/items"
+        expected = self.client.get(url).json()
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), expected)
+
+    def test_uncompressed_by_default(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.json()["type"], "FeatureCollection")
+
+    def test_gzip_streamed_items(self):
+        url = f"{collections_url}/tests.point_2056_10fields_streamed/items"
+        expected = json.loads(b"".join(self.client.get(url).streaming_content))
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip;q=1, identity;q=0.5"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(b"".join(response.streaming_content))), expected)
+
+    def test_cached_items_sent_precompressed(self):
+        url = f"{collections_url}/tests.point_2056_10fields_cached_responses/items"
+        first = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        second = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(second.headers["Content-Encoding"], "gzip")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(json.loads(gzip.decompress(second.content)), self.client.get(url).json())
+
+    def test_negotiate_encoding(self):
+        factory = RequestFactory()
+        for accept_encoding, expected in (
+            ("", None),
+            ("gzip", "gzip"),
+            ("gzip;q=0", None),
+            ("identity", None),
+            ("*", next(iter(COMPRESSORS))),
+            ("*, gzip;q=0", next((encoding for encoding in COMPRESSORS if encoding != "gzip"), None)),
+        ):
+            request = factory.get("/", headers={"Accept-Encoding": accept_encoding})
+            self.assertEqual(negotiate_encoding(request), expected, accept_encoding)
+
+
+class TestCoordinatePrecision(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.point = Point_2056_10fields.objects.create(geom="Point(2508500.123456 1152000.987654)")
+
+    def get_coordinates(self, **params) -> list[float]:
+        url = f"{collections_url}/tests.point_2056_10fields/items/{self.point.pk}"
+        return self.client.get(url, params).json()["geometry"]["coordinates"]
+
+    def test_default_precision_from_crs_units(self):
+        self.assertEqual(get_default_precision(2056), 3)
+        self.assertEqual(get_default_precision(4326), 8)
+        crs = "http://www.opengis.net/def/crs/EPSG/0/2056"
+        self.assertEqual(self.get_coordinates(crs=crs), [2508500.123, 1152000.988])
+        longitude, latitude = self.get_coordinates()
+        self.assertEqual(longitude, round(longitude, 8))
+
+    def test_precision_parameter(self):
+        crs = "http://www.opengis.net/def/crs/EPSG/0/2056"
+        self.assertEqual(self.get_coordinates(crs=crs, precision=0), [2508500, 1152001])
+        self.assertEqual(self.get_coordinates(crs=crs, precision=5), [2508500.12346, 1152000.98765])
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields/items", {"precision": -1})
+        self.assertEqual(response.status_code, 422)
+
+
+class TestSimplification(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # A line zigzagging by 1m (then 5m) every 10m
+        coordinates = [(2508500 + 10 * i, 1152000 + (i % 2) * (1 if i < 10 else 5)) for i in range(20)]
+        cls.line = Line_2056_10fields.objects.create(
+            geom="LineString({})".format(", ".join(f"{x} {y}" for x, y in coordinates))
+        )
+
+    def count_vertices(self, collection: str, **params) -> int:
+        url = f"{collections_url}/{collection}/items"
+        params = {"crs": "http://www.opengis.net/def/crs/EPSG/0/2056", **params}
+        return len(self.client.get(url, params).json()["features"][0]["geometry"]["coordinates"])
+
+    def test_simplify(self):
+        self.assertEqual(self.count_vertices("tests.line_2056_10fields"), 20)
+        self.assertEqual(self.count_vertices("tests.line_2056_10fields", simplify=2), 11)
+        self.assertEqual(self.count_vertices("tests.line_2056_10fields", simplify=10), 2)
+        # 1:25'000 is 7m per pixel
+        self.assertEqual(self.count_vertices("tests.line_2056_10fields", **{"scale-denominator": 25000}), 2)
+
+    def test_simplify_item(self):
+        url = f"{collections_url}/tests.line_2056_10fields/items/{self.line.pk}"
+        params = {"crs": "http://www.opengis.net/def/crs/EPSG/0/2056"}
+        self.assertEqual(len(self.client.get(url, params).json()["geometry"]["coordinates"]), 20)
+        self.assertEqual(len(self.client.get(url, {**params, "simplify": 10}).json()["geometry"]["coordinates"]), 2)
+        scaled = self.client.get(url, {**params, "scale-denominator": 25000}).json()
+        self.assertEqual(len(scaled["geometry"]["coordinates"]), 2)
+
+    def test_max_simplification(self):
+        self.assertEqual(self.count_vertices("tests.line_2056_10fields_capped", simplify=10), 11)
+        self.assertEqual(self.count_vertices("tests.line_2056_10fields_capped", **{"scale-denominator": 25000}), 11)
+
+
+class TestTiles(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.point = Point_2056_10fields.objects.create(geom="Point(2508500 1152000)", field_int=42, field_str_0="foo")
+
+    def get_tile(self, collection: str, z: int, **headers):
+        lon, lat = self.point.geom.transform(4326, clone=True).coords
+        x = int((lon + 180) / 360 * 2**z)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * 2**z)
+        return self.client.get(f"{collections_url}/{collection}/tiles/{z}/{x}/{y}", headers=headers)
+
+    def test_tile(self):
+        response = self.get_tile("tests.point_2056_10fields", 12)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertIn("public", response.headers["Cache-Control"])
+        self.assertIn(b"tests.point_2056_10fields", response.content)
+        self.assertIn(b"field_str_0", response.content)
+
+    def test_empty_tile(self):
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields/tiles/12/0/0")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+
+    def test_invalid_tile(self):
+        self.assertEqual(self.client.get(f"{collections_url}/tests.point_2056_10fields/tiles/2/4/0").status_code, 404)
+        self.assertEqual(self.client.get(f"{collections_url}/tests.nogeom_10fields/tiles/0/0/0").status_code, 404)
+
+    def test_tile_fields_by_zoom(self):
+        self.assertNotIn(b"field_str_0", self.get_tile("tests.point_2056_10fields_tiles", 4).content)
+        content = self.get_tile("tests.point_2056_10fields_tiles", 12).content
+        self.assertIn(b"field_str_0", content)
+        self.assertNotIn(b"field_int", content)
+        self.assertIn(b"field_int", self.get_tile("tests.point_2056_10fields_tiles", 14).content)
+
+
+class TestFlatGeobuf(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_flatgeobuf_items(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        response = self.client.get(url, {"f": "fgb"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/flatgeobuf")
+        self.assertEqual(response.content[:3], b"fgb")
+        self.assertIn("Accept", response.headers["Vary"])
+        negotiated = self.client.get(url, headers={"Accept": "application/flatgeobuf, application/geo+json;q=0.5"})
+        self.assertEqual(negotiated.content, response.content)
+        self.assertEqual(self.client.get(url, {"f": "json"}).headers["Content-Type"], "application/geo+json")
+        self.assertEqual(self.client.get(f"{collections_url}/tests.nogeom_10fields/items?f=fgb").status_code, 406)
+
+    def test_empty_flatgeobuf(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        response = self.client.get(url, {"f": "fgb", "bbox": "0,0,1,1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content[:8], b"fgb\x03fgb\x00")
+        header_size = int.from_bytes(response.content[8:12], "little")
+        # A header and no feature
+        self.assertEqual(len(response.content), 12 + header_size)
+
+    def test_max_features(self):
+        url = f"{collections_url}/tests.point_2056_10fields_fgb_capped/items"
+        self.assertEqual(self.client.get(url, {"f": "fgb"}).status_code, 400)
+        Point_2056_10fields.objects.exclude(pk__in=Point_2056_10fields.objects.values("pk")[:2]).delete()
+        self.assertEqual(self.client.get(url, {"f": "fgb"}).status_code, 200)
+
+    def test_unpaginated_formats(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        for f in ("fgb", "csv"):
+            for params in ({"limit": 10}, {"offset": 5}, {"cursor": "abc"}):
+                self.assertEqual(self.client.get(url, {"f": f, **params}).status_code, 400, (f, params))
+
+    def test_range_requests(self):
+        url = f"{collections_url}/tests.point_2056_10fields_cached_responses/items?f=fgb"
+        content = self.client.get(url).content
+        response = self.client.get(url, headers={"Range": "bytes=0-7"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, content[:8])
+        self.assertEqual(response.headers["Content-Range"], f"bytes 0-7/{len(content)}")
+        self.assertEqual(self.client.get(url, headers={"Range": "bytes=-4"}).content, content[-4:])
+        self.assertEqual(self.client.get(url, headers={"Range": f"bytes={len(content)}-"}).status_code, 416)
+
+
+class TestOutputFormats(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def test_enabled_formats(self):
+        url = f"{collections_url}/tests.point_2056_10fields_fgb/items"
+        self.assertEqual(self.client.get(url).headers["Content-Type"], "application/flatgeobuf")
+        response = self.client.get(url, headers={"Accept": "application/geo+json"})
+        self.assertEqual(response.headers["Content-Type"], "application/geo+json")
+        self.assertEqual(self.client.get(url, {"f": "ndjson"}).status_code, 406)
+        self.assertEqual(self.client.get(url, {"f": "shp"}).status_code, 400)
+
+    def test_encoder_requires_encode(self):
+        class IncompleteEncoder(Encoder):
+            name = "incomplete"
+            media_type = "text/plain"
+
+        with self.assertRaises(TypeError):
+            IncompleteEncoder()
+
+
+class TestPropertySelection(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def test_properties(self):
+        url = f"{collections_url}/tests.nogeom_100fields/items"
+        response = self.client.get(url, {"properties": "field_str_10,field_int"})
+        self.assertEqual(response.status_code, 200)
+        for feature in response.json()["features"]:
+            self.assertEqual(list(feature["properties"]), ["field_str_10", "field_int"])
+        response = self.client.get(url, {"properties": ""})
+        self.assertTrue(all(feature["properties"] == {} for feature in response.json()["features"]))
+        self.assertEqual(self.client.get(url, {"properties": "field_int,nope"}).status_code, 400)
+
+    def test_properties_rendered_in_database(self):
+        url = f"{collections_url}/tests.point_2056_10fields_db/items"
+        expected = self.client.get(url).json()
+        response = self.client.get(url, {"properties": "field_int"}).json()
+        self.assertEqual(
+            [feature["properties"] for feature in response["features"]],
+            [{"field_int": feature["properties"]["field_int"]} for feature in expected["features"]],
+        )
+
+    def test_excluded_properties(self):
+        # Properties outside the collection fields can't be requested
+        url = f"{collections_url}/tests.point_2056_10fields_subset/items"
+        self.assertEqual(self.client.get(url, {"properties": "field_str_1"}).status_code, 400)
+
+
+class TestSkipGeometry(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def test_skip_geometry(self):
+        for collection_id in ("tests.point_2056_10fields", "tests.point_2056_10fields_db"):
+            url = f"{collections_url}/{collection_id}/items"
+            expected = self.client.get(url).json()
+            response = self.client.get(url, {"skipGeometry": "true"}).json()
+            self.assertTrue(all(feature["geometry"] is None for feature in response["features"]))
+            self.assertEqual(
+                [feature["properties"] for feature in response["features"]],
+                [feature["properties"] for feature in expected["features"]],
+            )
+            self.assertIsNone(response.get("bbox"))
+
+    def test_skip_geometry_flatgeobuf(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        self.assertEqual(self.client.get(url, {"skipGeometry": "true", "f": "fgb"}).status_code, 400)
+
+
+class TestCQL2Filter(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def get_items(self, **params):
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields/items", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assertMatches(self, response, qs):
+        self.assertEqual(response["numberMatched"], qs.count())
+        self.assertEqual(
+            {feature["id"] for feature in response["features"]}, {str(pk) for pk in qs.values_list("pk", flat=True)}
+        )
+
+    def test_comparisons(self):
+        objects = Point_2056_10fields.objects
+        self.assertMatches(self.get_items(filter="field_int > 500"), objects.filter(field_int__gt=500))
+        self.assertMatches(
+            self.get_items(filter="field_int BETWEEN 100 AND 300 OR field_str_0 LIKE 'a%'"),
+            objects.filter(Q(field_int__range=(100, 300)) | Q(field_str_0__startswith="a")),
+        )
+        self.assertMatches(
+            self.get_items(filter="NOT field_int IN (1, 2, 3) AND field_str_1 IS NOT NULL"),
+            objects.exclude(field_int__in=(1, 2, 3)).filter(field_str_1__isnull=False),
+        )
+
+    def test_cql2_json(self):
+        expression = {"op": "<=", "args": [{"property": "field_int"}, 250]}
+        self.assertEqual(
+            self.get_items(filter=json.dumps(expression), **{"filter-lang": "cql2-json"})["features"],
+            self.get_items(filter="field_int <= 250")["features"],
+        )
+
+    def test_spatial(self):
+        response = self.get_items(
+            filter="S_INTERSECTS(geom, BBOX(2508450, 1151950, 2508650, 1152150))",
+            **{"filter-crs": "http://www.opengis.net/def/crs/EPSG/0/2056"},
+        )
+        bbox = Polygon.from_bbox((2508450, 1151950, 2508650, 1152150))
+        bbox.srid = 2056
+        self.assertMatches(response, Point_2056_10fields.objects.filter(geom__intersects=bbox))
+        self.assertTrue(response["features"])
+
+    def test_invalid_filters(self):
+        url = f"{collections_url}/tests.point_2056_10fields_subset/items"
+        for expression in (
+            "field_int >",
+            "field_str_1 = 'a'",
+            "field_int = 'abc'",
+            "S_INTERSECTS(field_int, BBOX(0, 0, 1, 1))",
+            "geom = 'POINT(0 0)'",
+            "geom LIKE 'a%'",
+            "field_int = geom",
+            "(" * 100 + "field_int = 1" + ")" * 100,
+            "NOT " * 100 + "field_int = 1",
+        ):
+            self.assertEqual(self.client.get(url, {"filter": expression}).status_code, 400, expression)
+        deep = '{"op": "not", "args": [' * 1000 + "true" + "]}" * 1000
+        response = self.client.get(url, {"filter": deep, "filter-lang": "cql2-json"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_float_literals(self):
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        for expression in (
+            "field_int < 2.9",
+            "field_int = 1.5",
+            "field_int BETWEEN 1.5 AND 300",
+            "field_int IN (1, 2.5)",
+            "field_int = TRUE",
+        ):
+            self.assertEqual(self.client.get(url, {"filter": expression}).status_code, 400, expression)
+        objects = Point_2056_10fields.objects
+        self.assertMatches(self.get_items(filter="field_int < 300.0"), objects.filter(field_int__lt=300))
+        self.assertMatches(
+            self.get_items(filter="field_int BETWEEN 1e2 AND 3e2"), objects.filter(field_int__range=(100, 300))
+        )
+
+    def test_negations_exclude_nulls(self):
+        objects = Point_2056_10fields.objects
+        objects.filter(pk__in=objects.values("pk")[:5]).update(field_int=None, field_str_0=None)
+        not_null = objects.filter(field_int__isnull=False)
+        for expression, expected in (
+            ("field_int <> 1", not_null.exclude(field_int=1)),
+            ("NOT field_int = 1", not_null.exclude(field_int=1)),
+            ("NOT field_int IN (1, 2)", not_null.exclude(field_int__in=(1, 2))),
+            ("field_str_0 NOT LIKE 'a%'", not_null.exclude(field_str_0__startswith="a")),
+            ("NOT (field_int > 500 OR field_int < 100)", not_null.filter(field_int__range=(100, 500))),
+            ("NOT field_int IS NULL", not_null),
+        ):
+            self.assertMatches(self.get_items(filter=expression, limit=100), expected)
+
+    def test_parsed_filters_memoized(self):
+        self.assertIs(parse_filter("field_int = 1"), parse_filter("field_int = 1"))
+
+
+class TestQueryables(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_queryables(self):
+        url = f"{collections_url}/tests.point_2056_10fields_subset/queryables"
+        response = self.client.get(url)
+        self.assertEqual(response.headers["Content-Type"], "application/schema+json")
+        response = response.json()
+        self.assertEqual(response["$id"], f"http://testserver{url}")
+        self.assertFalse(response["additionalProperties"])
+        self.assertEqual(set(response["properties"]), {"field_int", "field_str_0", "geom"})
+        self.assertEqual(response["properties"]["field_int"]["type"], "integer")
+        self.assertFalse(response["properties"]["field_int"]["x-oapif-indexed"])
+        # Geometry fields get a spatial index by default
+        self.assertTrue(response["properties"]["geom"]["x-oapif-indexed"])
+        collection = self.client.get(f"{collections_url}/tests.point_2056_10fields_subset").json()
+        self.assertIn(
+            "http://www.opengis.net/def/rel/ogc/1.0/queryables", [link["rel"] for link in collection["links"]]
+        )
+
+    def test_reject_unindexed_filters(self):
+        url = f"{collections_url}/tests.point_2056_10fields_indexed_filters/items"
+        self.assertEqual(self.client.get(url, {"filter": "field_int > 5"}).status_code, 400)
+        response = self.client.get(url, {"filter": "unknown > 5"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("unknown property", response.json()["detail"])
+        pk = Point_2056_10fields.objects.values_list("pk", flat=True).first()
+        response = self.client.get(url, {"filter": f"id = '{pk}' AND S_INTERSECTS(geom, BBOX(0, 0, 90, 90))"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_throttle_unindexed_filters(self):
+        url = f"{collections_url}/tests.point_2056_10fields_throttled_filters/items"
+        # Invalid filters don't use the rate
+        self.assertEqual(self.client.get(url, {"filter": "field_int > 'abc'"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"filter": "field_int > 5"}).status_code, 200)
+        self.assertEqual(self.client.get(url, {"filter": "field_int > 5"}).status_code, 429)
+
+
+class TestCSV(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def get_rows(self, url, **params):
+        response = self.client.get(url, {"f": "csv", **params})
+        self.assertEqual(response.headers["Content-Type"], "text/csv")
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_attributes(self):
+        header, *rows = self.get_rows(f"{collections_url}/tests.nogeom_100fields/items")
+        self.assertEqual(len(header), len(oapif.collections["tests.nogeom_100fields"].fields))
+        self.assertEqual(len(rows), NoGeom_100fields.objects.count())
+
+    def test_geometries(self):
+        header, *rows = self.get_rows(f"{collections_url}/tests.point_2056_10fields_subset/items")
+        self.assertEqual(header, ["field_int", "field_str_0", "geom"])
+        self.assertTrue(rows)
+        self.assertTrue(all(row[2].startswith("POINT(") for row in rows))
+        header, *rows = self.get_rows(f"{collections_url}/tests.point_2056_10fields_wkb/items")
+        self.assertEqual(header, ["field_int", "field_str_0", "geom"])
+        # Hex-encoded little-endian WKB points
+        self.assertTrue(all(row[2].startswith("0101000000") for row in rows))
+
+    def test_no_columns(self):
+        url = f"{collections_url}/tests.point_2056_10fields_subset/items"
+        header, *rows = self.get_rows(url, properties="")
+        self.assertEqual(header, ["geom"])
+        response = self.client.get(url, {"f": "csv", "properties": "", "skipGeometry": "true"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(f"{collections_url}/tests.nogeom_10fields/items", {"f": "csv", "properties": ""})
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(is_export_available(), "requires the export extra")
+class TestColumnarExport(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("populate_data", size=20)
+
+    def test_export_geoparquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        response = self.client.get(f"{collections_url}/tests.point_2056_10fields/export")
+        self.assertEqual(response.headers["Content-Type"], "application/vnd.apache.parquet")
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(table.num_rows, Point_2056_10fields.objects.count())
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("field_str_0").type))
+        geo = json.loads(table.schema.metadata[b"geo"])
+        self.assertEqual(geo["primary_column"], "geom")
+        self.assertEqual(geo["columns"]["geom"]["geometry_types"], ["Point"])
+        self.assertNotIn("crs", geo["columns"]["geom"])
+
+    def test_export_arrow_stream(self):
+        import pyarrow as pa
+
+        url = f"{collections_url}/tests.point_2056_10fields/export"
+        response = self.client.get(url, {"f": "arrow", "crs": "http://www.opengis.net/def/crs/EPSG/0/2056"})
+        table = pa.ipc.open_stream(b"".join(response.streaming_content)).read_all()
+        self.assertEqual(table.num_rows, Point_2056_10fields.objects.count())
+        geo = json.loads(table.schema.metadata[b"geo"])
+        self.assertEqual(geo["columns"]["geom"]["crs"]["id"], {"authority": "EPSG", "code": 2056})
+
+    def test_items_geoparquet(self):
+        import pyarrow.parquet as pq
+
+        url = f"{collections_url}/tests.point_2056_10fields/items"
+        response = self.client.get(url, {"f": "parquet"})
+        self.assertEqual(response.headers["Content-Type"], "application/vnd.apache.parquet")
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(table.num_rows, Point_2056_10fields.objects.count())
+        # Exports are not paginated
+        self.assertEqual(self.client.get(url, {"f": "parquet", "limit": 1}).status_code, 400)
+
+    def test_export_command(self):
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/points.parquet"
+            call_command(
+                "export_collection",
+                "django_oapif_tests.tests.oapif.oapif",
+                "tests.point_2056_10fields",
+                path,
+                stdout=io.StringIO(),
+            )
+            self.assertEqual(pq.read_table(path).num_rows, Point_2056_10fields.objects.count())
+
+
+class TestFeatureSerializer(SimpleTestCase):
+    def test_serialize_row(self):
+        serializer = FeatureSerializer(LayerWithFile, ("id", "file"), None)
+        pk = uuid.uuid4()
+        self.assertEqual(serializer.columns, ("pk", "id", "file"))
+        self.assertEqual(
+            json.loads(serializer.serialize((pk, pk, "foo/bar.txt"))),
+            {
+                "type": "Feature",
+                "id": str(pk),
+                "geometry": None,
+                "properties": {"id": str(pk), "file": "/media/foo/bar.txt"},
+            },
+        )
+        self.assertIsNone(json.loads(serializer.serialize((pk, pk, "")))["properties"]["file"])
+
+    def test_serialize_geometry_verbatim(self):
+        serializer = FeatureSerializer(Point_2056_10fields, ("field_int",), "_oapif_geometry")
+        geometry = '{"type":"Point","coordinates":[2508500.123,1152000]}'
+        rendered = serializer.serialize((1, geometry, 42, "ignored trailing column"))
+        self.assertIn(f'"geometry":{geometry}', rendered)
+        self.assertEqual(json.loads(rendered)["properties"], {"field_int": 42})